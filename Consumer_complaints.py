@@ -23,6 +23,9 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from cfpb import (CompanyStats, ComplaintCube, ComplaintIndex, ComplaintTimeSeries, GeoIndex, Validator,
+                  complaint_shares, load_complaints, normalize_labels, null_rates, parse_dates, profiling,
+                  recategorize_products, value_counts)
 # %matplotlib inline
 
 def print_full(x):
@@ -32,7 +35,15 @@ def print_full(x):
     pd.reset_option('display.max_rows')
 
 
-complaints = pd.read_csv('Consumer_Complaints.csv')
+# The loader only parses the columns kept below (see Clean Data (A)) and streams the file in chunks,
+# so the large 'Consumer complaint narrative' column is never held in memory (cfpb.narratives searches it).
+# It also reads the .zip/.gz download or several files at once (see cfpb.load.complaint_sources).
+complaints = load_complaints('Consumer_Complaints.csv')
+
+# The cells below walk through each cleaning step; cfpb.load_clean_complaints() runs them once and caches the result.
+# For daily exports, cfpb.refresh() only cleans complaints that are new or changed (cfpb.incremental).
+# The store also keeps sketches for approximate counts (cfpb.load_store_sketches, error bounds in cfpb.sketch).
+# Counting-only jobs can share cfpb.load_column_store(), which memory-maps label codes and dates (cfpb.columnar).
 
 print(f'Number of complaints: {len(complaints)}')
 complaints.head()
@@ -42,32 +53,23 @@ complaints.head()
 # * Rename columns for ease of use.
 # * Convert dates to date_time type.
 #
-# [To Do:] Check for null values
-
-# +
-unnecessary_cols = ['Consumer complaint narrative', 'Company public response', 'Tags', 
-                'Consumer consent provided?', 'Submitted via', 'Date sent to company', 'Timely response?', 
-                'Complaint ID']
+# * Check for null values, and validate the data after every cleaning step (cfpb.validate): null rates
+#     and date range are errors (a ValidationError stops the notebook at the step that broke the data);
+#     unknown products/responses, malformed states/ZIPs and dates parse_dates couldn't parse are warnings.
 
-complaints.drop(unnecessary_cols, axis = 1, inplace = True)
-# -
+# Dropping (cfpb.UNNECESSARY_COLS) and renaming (cfpb.COLUMN_NAMES) happen inside load_complaints
+# at read time.
+# Reference: https://www.dataquest.io/blog/pandas-cheat-sheet/
 
-complaints.head()
+print(null_rates(complaints))
+validator = Validator(complaints)
 
-# Reference: https://www.dataquest.io/blog/pandas-cheat-sheet/
-complaints.rename(columns = {'Date received': 'date_received', 'Product': 'product',
-                            'Sub-product': 'sub_product', 'Issue': 'issue',
-                            'Sub-issue': 'sub_issue', 'Company': 'company',
-                            'State': 'state', 'Zip code': 'zip',
-                            'Company response to consumer': 'company_response_to_consumer',
-                            'Consumer disputed?': 'disputed'},
-                 inplace = True)
-
-complaints['date_received'] = pd.to_datetime(complaints['date_received'],format = '%m/%d/%Y', errors = 'ignore')
+parse_dates(complaints)
+validator.check(complaints, 'parse_dates')
 complaints.head()
 
 # ## Investigate Data (1)
-# * Review column names and object types (all 'object' are strings, and therefore could require additional cleaning).
+# * Review column names and object types (label columns are 'category', see cfpb.schema; date_received is datetime64 now that parse_dates has run).
 # * Identify number of products (18) and subproducts (77).
 # * Identify most complained about products and subproducts.
 #
@@ -84,34 +86,34 @@ print("Sub-products: ", len(complaints['sub_product'].unique() ))
 
 # +
 """ Display products sorted by # of complaints """
-products = complaints['product'].value_counts()
+products = value_counts(complaints['product'])
 
-print(complaints['product'].value_counts())
+print(value_counts(complaints['product']))
 print('\n')
 
-complaints['product'].value_counts().plot(kind='bar')
+value_counts(complaints['product']).plot(kind='bar')
 
 # +
 """ Review all sub-products
 Recall: print_full defined above, to display all rows """
 
-print_full(complaints['sub_product'].value_counts())
+print_full(value_counts(complaints['sub_product']))
 
 # +
 """ Check which products the 'I do not know' sub_product is most found in """
 
 idk_bool = complaints['sub_product'] == 'I do not know' # Bool for all sub_products with "I do not know" as answer
-print( complaints['product'][idk_bool].value_counts() )
+print( value_counts(complaints['product'][idk_bool]) )
 
 """ Check what other sub_products exist within the 'Debt collection' product """
-print( complaints['sub_product'][complaints['product'] == 'Debt collection'].value_counts())
+print( value_counts(complaints['sub_product'][complaints['product'] == 'Debt collection']))
 
 # +
 """ Check in which product categories the sub_product 'Other (i.e. phone, health club, etc.) exists.
 Result: only in 'Debt collection'
 """
 
-complaints[complaints['sub_product'] == 'Other (i.e. phone, health club, etc.)']['product'].value_counts()
+value_counts(complaints[complaints['sub_product'] == 'Other (i.e. phone, health club, etc.)']['product'])
 # -
 
 # ## Observations:
@@ -127,26 +129,24 @@ complaints[complaints['sub_product'] == 'Other (i.e. phone, health club, etc.)']
 # ## Clean Data (B):
 # * Rename and consolidate 'I do not know' and 'Other (i.e.phone, health club, etc.)' sub_product into 'Other debt' within
 #     the 'Debt collection' product.
+# * Make other inconsistent labels consistent: 'Consumer Loan' / 'Consumer loan' products, and the
+#     'Incorrect information on credit report' issue, renamed 'Incorrect information on your report' in 2017.
+#
+# The renames live in cfpb.labels.LABEL_MAP. Labels are matched exactly (ignoring case and whitespace), so unlike
+# str.replace, labels that merely contain one of these phrases are left alone.
 
 # +
-complaints['sub_product'] = complaints['sub_product'].str.replace('I do not know', 'Other debt')
-complaints['sub_product'] = complaints['sub_product'].str.replace('Other (i.e. phone, health club, etc.)', 'Other debt', 
-                                                                 regex = False) 
+label_changes = normalize_labels(complaints)
+validator.check(complaints, 'normalize_labels')
+print(label_changes.to_string())
 
-"""
-Note: str.replace(regex = False) will treat the string being replace as a literal rather than a regex expression. 
-Necessary to parse the parantheses in 'Other (i.e. phone, health club, etc.)', which would otherwise be
-treated as capture groups.
-see: https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.Series.str.replace.html 
-"""
+# Label -> row indexes for the filter/count questions below (cfpb.query); rebuilt after any relabelling
+index = ComplaintIndex.from_frame(complaints)
 
 # Confirm subproducts have been renamed in 'Debt collection product'
-print_full(complaints[complaints['product'] == 'Debt collection']['sub_product'].value_counts())
+print_full(index.value_counts('sub_product', product='Debt collection'))
 # -
 
-# [SHOULD THIS GO SOMEWHERE ELSE?]
-complaints.loc[complaints['product'] == 'Consumer Loan'] = 'Consumer loan' # for consistency's sake
-
 # ## Clean Data (C):
 # Rename & resort product categories for overlapping/redundant sub-category names 
 #
@@ -169,29 +169,21 @@ complaints.loc[complaints['product'] == 'Consumer Loan'] = 'Consumer loan' # for
 
 
 # Credit card or prepaid card
-credit_or_prepaid_bool = complaints['product'] == 'Credit card or prepaid card'
-# IS THIS AN UNNECESSARY STEP? CAN IT BE REWRITTEN?
-credit_or_prepaid_cards = complaints[credit_or_prepaid_bool]
 print("Credit or prepaid card sub_products:", 
       '\n', 
-      credit_or_prepaid_cards['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Credit card or prepaid card'),
      '\n')
 
 # Credit cards
-credit_card_bool = complaints['product'] == 'Credit card'
-credit_cards = complaints[credit_card_bool]
-
 print("Credit cards sub_products:", 
       '\n', 
-      credit_cards['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Credit card'),
      '\n')
 
 # Prepaid cards
-prepaid_bool = complaints['product'] == 'Prepaid card'
-prepaid_cards = complaints[prepaid_bool]
 print("Prepaid cards sub_products:",
       '\n',
-      prepaid_cards['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Prepaid card'),
       '\n')
 
 
@@ -200,262 +192,135 @@ print("Prepaid cards sub_products:",
 """ 2. Money transfer, virtual currency, or money service / Money transfer / Virtual currency  """
 
 # Money transfer, virtual currency, or money service
-mt_vc_ms_bool = complaints['product'] == 'Money transfer, virtual currency, or money service'
-mt_vc_ms_subproducts = complaints[mt_vc_ms_bool]
 print("Money transfer, virtual currency, or money service sub_products:", 
       '\n', 
-      mt_vc_ms_subproducts['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Money transfer, virtual currency, or money service'),
      '\n')
 
 # Money transfer
-mt_bool = complaints['product'] == 'Money transfer'
-mt_subproducts = complaints[mt_bool]
 print("Money transfer sub_products:", 
       '\n', 
-      mt_subproducts['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Money transfer'),
      '\n')
 
 # Virtual currency
-vc_bool = complaints['product'] == 'Virtual currency'
-vc_subproducts = complaints[vc_bool]
 print("Virtual currency sub_products:", 
       '\n', 
-      vc_subproducts['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Virtual currency'),
      '\n')
 
 # +
 """ 3. Payday, title or personal loan / Payday loan / consumer loan """
 
 # Payday loan, title loan, or personal loan                                        
-pl_tl_pl_bool = complaints['product'] == 'Payday loan, title loan, or personal loan'
-pl_tl_pl_subproducts = complaints[pl_tl_pl_bool]
 print("Payday loan, title loan, or personal sub_products:", 
       '\n', 
-      pl_tl_pl_subproducts['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Payday loan, title loan, or personal loan'),
      '\n')
 
 # Payday loan
-pl_bool = complaints['product'] == 'Payday loan'
-pl_subproducts = complaints[pl_bool]
 print("Payday loan sub_products:", 
       '\n', 
-      pl_subproducts['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Payday loan'),
      '\n')
 
 # Consumer loan 
-cl_bool = complaints['product'] == 'Consumer loan'
-cl_subproducts = complaints[cl_bool]
 print("Consumer loan sub_products:", 
       '\n', 
-      cl_subproducts['sub_product'].value_counts(),
+      index.value_counts('sub_product', product='Consumer loan'),
      '\n')
 
-# -
-
-# ### Resort overlapping product and sub_product categories
-
-# +
-""" 
-Initially, ran into issues with settingiwthcopywarning in this cell, due to chained indexing.
-Accurate syntax for fixing this was found at: https://www.dataquest.io/blog/settingwithcopywarning/
-"""
-
-
-# Resort the following into 'Credit card' product
-credit_card_group = ['General-purpose credit card or charge card',
-                    'Store credit card']
-
-for item in credit_card_group:
-    complaints.loc[complaints['sub_product'] == item, 'product'] = 'Credit card'
-
-
-# Resort the following into 'Prepaid card' product group
-prepaid_card_group = ['General-purpose prepaid card', 'Government benefit card', 'Payroll card', 
-                     'Gift card', 'Student prepaid card']
-
-for item in prepaid_card_group:
-    complaints.loc[complaints['sub_product'] == item, 'product'] = 'Prepaid card'
-
-
-
-
 # -
 
 print('Virtual currency products:')
-complaints.loc[complaints['sub_product'] == 'Virtual currency', 'product'].value_counts()
+index.value_counts('product', sub_product='Virtual currency')
 
 print('Virtual currency sub products:')
-complaints.loc[complaints['product'] == 'Virtual currency', 'sub_product'].value_counts()
+index.value_counts('sub_product', product='Virtual currency')
 
 # ### Observations:
 # * The only "Virtual currency" product has a sub_product that fits more appropriately in a "Money Transfer" product
 # * All "Virtual currency" sub_products currently fall within the "Money transfer, Virtual currency, or money service" product
 
-# +
-""" Re-sort Money transfers, virtual currency, or money service / money transfers / virtual currency """
-
-# All 'virtual currency' sub_product sorted into the 'virtual currency' product group
-complaints.loc[complaints['sub_product'] == 'Virtual currency', 'product'] = 'Virtual currency'
-complaints.loc[complaints['sub_product'] == 'Mobile or digital wallet', 'product'] = 'Virtual currency'
-
-# All 'Money transfers', which originally were in 'Virtual currency' product group, 
-# sorted into 'Money transfer' product group
-complaints.loc[complaints['sub_product'] == 'Domestic (US) money transfer', 'product'] = 'Money transfers'
-complaints.loc[complaints['sub_product'] == 'International money transfer', 'product'] = 'Money transfers'
-complaints.loc[complaints['sub_product'] == 'Foreign currency exchange', 'product'] = 'Money transfers'
-
-
-# Rename trimmed product group 
-complaints.loc[complaints['product'] == 'Money transfer, virtual currency, or money service', 'product'] = 'Money service'
-
-
+# ### Resort overlapping product and sub_product categories
+# The rules live in cfpb.recategorize.PRODUCT_RULES as a (product, sub_product) -> new product table:
+# * 'Credit card' and 'Prepaid card' sub_products are sorted into their own product groups.
+# * All 'virtual currency' sub_products are sorted into 'Virtual currency', money transfers into 'Money transfers',
+#     and the trimmed 'Money transfer, virtual currency, or money service' group is renamed 'Money service'.
+# * 'Payday loan, title loan, or personal loan' is split into 'Payday loan' and 'Consumer loan'.
+# * The credit reporting product category name is shortened to 'Credit reporting'.
 
 # +
-""" Re-sort Payday, title, personal loans / payday loans / consumer loans """
-
-# Payday loans
-complaints.loc[(complaints['sub_product'] == 'Payday loan') &  
-               (complaints['product'] == 'Payday loan, title loan, or personal loan'), 'product'] = 'Payday loan'
-
-# Consumer loans
-complaints.loc[(complaints['sub_product'] == 'Personal line of credit') &  
-               (complaints['product'] == 'Payday loan, title loan, or personal loan'), 'product'] = 'Consumer loan'
-
-complaints.loc[(complaints['sub_product'] == 'Installment loan') &  
-               (complaints['product'] == 'Payday loan, title loan, or personal loan'), 'product'] = 'Consumer loan'
-
-complaints.loc[(complaints['sub_product'] == 'Title loan') &  
-               (complaints['product'] == 'Payday loan, title loan, or personal loan'), 'product'] = 'Consumer loan'
-
-complaints.loc[(complaints['sub_product'] == 'Pawn loan') &  
-               (complaints['product'] == 'Payday loan, title loan, or personal loan'), 'product'] = 'Consumer loan'
+""" 
+Initially, ran into issues with settingiwthcopywarning in this cell, due to chained indexing, with one
+complaints.loc[...] assignment per rule. All rules are now applied in a single pass over the frame.
+"""
 
+product_changes = recategorize_products(complaints)
+validator.check(complaints, 'recategorize_products')
+print(product_changes.to_string())
 
 # +
-""" Shorten credit reporting product category name"""
-
-complaints.loc[
-    complaints['product'] == 'Credit reporting, credit repair services, or other personal consumer reports', 
-               'product'] = 'Credit reporting'
+""" Review revised product/sub_category groups
+Product cleaning is done at this point, so all product/sub_product/issue/sub_issue counts from here on
+are sliced out of a single groupby over the frame (see cfpb.aggregate).
+"""
 
-# +
-""" Review revised product/sub_category groups """
+cube = ComplaintCube.from_frame(complaints)
 
 product_groups = ['Credit card', 'Prepaid card', 'Virtual currency', 'Money transfers', 'Money service',
            'Payday loan', 'Consumer loan']
 
 for product in product_groups:
-    print(f"{product}: \n{complaints.loc[complaints['product'] == product, 'sub_product'].value_counts()}\n")
+    print(f"{product}: \n{cube.sub_products(product)}\n")
 # -
 
 # ## Prepare data for presentation
 # * Create container variables for sub_products for easy comparison & graphic creation.
 # * Add % columns to product and sub_product dataframes for graphics.
 
-ack = 'blargh'
-ack + '_blargh'
-
-
-
 # +
 """ Create variables containing sub_products of each product """
-# DRY
-
-credit_reporting_bool = complaints['product'] == 'Credit reporting'
-credit_rep_subproducts = complaints[credit_reporting_bool]['sub_product'].value_counts()
-
-mortgage_bool = complaints['product'] == 'Mortgage'
-mortgage_subproducts = complaints[mortgage_bool]['sub_product'].value_counts()
-
-debt_col_bool = complaints['product'] == 'Debt collection'
-debt_col_subproducts = complaints[debt_col_bool]['sub_product'].value_counts()
-
-credit_card_bool = complaints['product'] == 'Credit card'
-credit_card_subproducts = complaints[credit_card_bool]['sub_product'].value_counts
-
-bank_account_bool = complaints['product'] == 'Bank account or service'
-bank_account_subproducts = complaints[bank_account_bool]['sub_product'].value_counts
-
-student_loan_bool = complaints['product'] == 'Studen loan'
-studen_loan_subproducts = complaints[student_loan_bool]['sub_product'].value_counts()
-
-checking_savings_bool = complaints['product'] == 'Checking or savings account'
-checking_savings_subproducts = complaints[checking_savings_bool]['sub_product'].value_counts()
-
-consumer_loan_bool = complaints['product'] == 'Consumer Loan'
-consumer_loan_subproducts = complaints[consumer_loan_bool]['sub_product'].value_counts()
-
-vehicle_loan_bool = complaints['product'] == 'Vehicle loan or lease'
-vehicle_loan_subproducts = complaints[vehicle_loan_bool]['sub_product'].value_counts()
-
-mt_bool = complaints['product'] == 'Money transfers'
-mt_subproducts = complaints[mt_bool]['sub_product'].value_counts()
-
-payday_bool = complaints['product'] == 'Payday loan'
-payday_subproducts = complaints[payday_bool]['sub_product'].value_counts()
-
-prepaid_bool = complaints['product'] == 'Prepaid card'
-prepaid_subproducts = complaints[prepaid_bool]['sub_product'].value_counts()
-
-vc_bool = complaints['product'] == 'Virtual currency'
-vc_subproducts = complaints[vc_bool]['sub_product'].value_counts()
-
-ms_bool = complaints['product'] == 'Money service'
-ms_subproducts = complaints[ms_bool]['sub_product'].value_counts()
-
-
-mt_bool = complaints['product'] == 'Money transfers'
-mt_subproducts = complaints[mt_bool]['sub_product'].value_counts()
-
-
-other_bool = complaints['product'] == 'Other financial service'
-other_subproducts = complaints[other_bool]['sub_product'].value_counts()
-
-
-
 
+credit_rep_subproducts = cube.sub_products('Credit reporting')
+mortgage_subproducts = cube.sub_products('Mortgage')
+debt_col_subproducts = cube.sub_products('Debt collection')
+credit_card_subproducts = cube.sub_products('Credit card')
+bank_account_subproducts = cube.sub_products('Bank account or service')
+student_loan_subproducts = cube.sub_products('Student loan')
+checking_savings_subproducts = cube.sub_products('Checking or savings account')
+consumer_loan_subproducts = cube.sub_products('Consumer loan')
+vehicle_loan_subproducts = cube.sub_products('Vehicle loan or lease')
+mt_subproducts = cube.sub_products('Money transfers')
+payday_subproducts = cube.sub_products('Payday loan')
+prepaid_subproducts = cube.sub_products('Prepaid card')
+vc_subproducts = cube.sub_products('Virtual currency')
+ms_subproducts = cube.sub_products('Money service')
+other_subproducts = cube.sub_products('Other financial service')
 
 
 # +
 # PRODUCTS IS A DUPLICATED VARIABLE ABOVE
-products = complaints['product'].value_counts()
-products = products.to_frame() # Otherwise 'products' is a series and additional column cannot be added
-
-# Calculate number of complaints by % of total and add as separate column
-products.columns = ['num_complaints']
-products['perc_total'] = products['num_complaints']/sum(products['num_complaints'])
+# Number of complaints and % of total per product (see cfpb.complaint_shares)
+products = complaint_shares(cube.totals('product'))
 
 print(products)
 print(sum(products['perc_total'])) # Check sum to 100%
 
 # +
-sub_products = complaints['sub_product'].value_counts()
-sub_products = sub_products.to_frame() # Otherwise sub_products is a series and additional column cannot be added
-
-# Calculate number of complaints by % of total
-sub_products.columns = ['num_complaints']
-sub_products['perc_total'] = sub_products['num_complaints']/sum(sub_products['num_complaints'])
+sub_products = complaint_shares(cube.totals('sub_product'))
 
 print(sub_products)
 print(sum(sub_products['perc_total'])) # Check sum to 100%
 
 # +
-# DRY
 """ Review most complained about sub_products in top 5 product groups"""
-print('Credit report', '\n', complaints.loc[complaints['product'] == 'Credit reporting', 'sub_product'].value_counts() )
-print('\n')
+top_products = {'Credit report': 'Credit reporting', 'Mortgage': 'Mortgage', 'Debt collection': 'Debt collection',
+                'Credit card': 'Credit card', 'Bank account or service': 'Bank account or service'}
 
-print('Mortgage', '\n', complaints.loc[complaints['product'] == 'Mortgage', 'sub_product'].value_counts() )
-print('\n')
-
-print('Debt collection', '\n', complaints.loc[complaints['product'] == 'Debt collection', 'sub_product'].value_counts() )
-print('\n')
-
-print('Credit card', '\n', complaints.loc[complaints['product'] == 'Credit card', 'sub_product'].value_counts() )
-print('\n')
-
-print('Bank account or service', '\n', complaints.loc[complaints['product'] == 'Bank account or service', 'sub_product'].value_counts() )
-print('\n')
+for title, product in top_products.items():
+    print(title, '\n', cube.sub_products(product) )
+    print('\n')
 
 # I wonder why complaints for fixed mortgages are twice as high as ARMs?
 # Difficult to know with the "other mortgage" category.
@@ -466,6 +331,8 @@ print('\n')
 #
 
 # ## Conclusions & visualizations
+# For batch jobs without a display, cfpb.render_report(cube, 'report') writes this chart and per-product
+# sub_product and issue charts as PNG/SVG files, rendered in parallel worker processes.
 
 # +
 """ Instructions for visualization"""
@@ -544,28 +411,63 @@ plt.show()
 
 credit_rep_subproducts.plot(kind='bar')
 
-# DRY
-print( complaints.loc[complaints['product'] == 'Credit reporting', 'issue'].value_counts() )
+print( cube.issues('Credit reporting') )
 print('\n')
-print( complaints.loc[complaints['product'] == 'Credit reporting', 'sub_issue'].value_counts() )
-print('\n')
-print( complaints.loc[complaints['product'] == 'Mortgage', 'issue'].value_counts() )
-print('\n')
-print( complaints.loc[complaints['product'] == 'Debt collection', 'issue'].value_counts() )
+print( cube.breakdown('sub_issue', product='Credit reporting') )
+for product in ['Mortgage', 'Debt collection', 'Credit card', 'Bank account or service']:
+    print('\n')
+    print( cube.issues(product) )
+
+
+# Investigate largest issues & sub_issues in credit reporting
+print( cube.breakdown('issue', sub_issue='Information belongs to someone else') )
 print('\n')
-print( complaints.loc[complaints['product'] == 'Credit card', 'issue'].value_counts() )
+print( cube.breakdown('product', sub_issue='Information belongs to someone else') )
 print('\n')
-print( complaints.loc[complaints['product'] == 'Bank account or service', 'issue'].value_counts() )
+# Includes the pre-2017 'Incorrect information on credit report' issue (see Clean Data (B))
+print( cube.sub_issues('Incorrect information on your report') )
 
+# ## Complaint volume over time
 
-# Investigate largest issues & sub_issues in credit reporting
-print( complaints.loc[complaints['sub_issue'] == 'Information belongs to someone else', 'issue'].value_counts() )
+# +
+""" Monthly complaints for the top products, sliced from one product x day count matrix (see cfpb.timeseries) """
+product_trends = ComplaintTimeSeries.from_frame(complaints, 'product')
+
+product_trends.counts(freq='M')[prod_greater_5_type].plot(title='Monthly complaints, top products')
+
+# Month-over-month change in credit reporting complaints
+print( product_trends.change('Credit reporting', freq='M').tail(12) )
+# -
+
+# ## Most complained about companies
+# Complaint counts, response types and dispute rates per company come from one groupby (see cfpb.companies).
+# Dispute rates only count complaints where the consumer answered the 'disputed' question.
+
+# +
+company_stats = CompanyStats.from_frame(complaints)
+
+print( company_stats.top_companies(10) )
 print('\n')
-print( complaints.loc[complaints['sub_issue'] == 'Information belongs to someone else', 'product'].value_counts() )
+print( company_stats.top_companies_by_product(3) )
 print('\n')
-print( complaints.loc[complaints['issue'] == 'Incorrect information on your report', 'sub_issue'].value_counts() )
+print( company_stats.responses() )
+# -
+
+# ## Complaints by state
+# State codes and ZIP prefixes are normalized against reference tables bundled with cfpb (masked zips such as
+# '100XX' keep their 3-digit prefix, which also fills in missing states). Counts per state/zip3 x product are
+# computed once, for the Basemap next step below.
+
+# +
+geo = GeoIndex.from_frame(complaints)
+
+print( geo.by_state().sort_values(ascending=False).head(10) )
 print('\n')
-print( complaints.loc[complaints['issue'] == 'Incorrect information on credit report', 'sub_issue'].value_counts() )
+print( geo.top_product_by_state() )
+# -
+
+# Time, peak memory and rows in/out/modified per pipeline stage, when run with CFPB_PROFILE=1 (see cfpb.profiling)
+profiling.report()
 
 
 # # Conclusions and observations:
@@ -0,0 +1 @@
+""" Timing and memory benchmarks for the cfpb cleaning pipeline, on synthetic CFPB-shaped data. """
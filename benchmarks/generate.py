@@ -0,0 +1,228 @@
+""" Deterministic generator of synthetic Consumer_Complaints.csv exports.
+
+The output has the export's 18 columns in the same order and format, and roughly its
+shape: 18 products with the real product/sub_product names (including every label the
+cleaning rules touch), Zipf-skewed sub_product, issue and company popularity, a few hundred
+issues and sub_issues, thousands of companies, masked 'XX' zip codes, disputes only before
+the 2017 form change, and multi-line quoted narratives on about a third of the rows.
+
+Same (n_rows, seed) -> byte-identical file.
+
+    python -m benchmarks.generate 1000000 complaints-1m.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+HEADER = ['Date received', 'Product', 'Sub-product', 'Issue', 'Sub-issue', 'Consumer complaint narrative',
+          'Company public response', 'Company', 'State', 'Zip code', 'Tags', 'Consumer consent provided?',
+          'Submitted via', 'Date sent to company', 'Company response to consumer', 'Timely response?',
+          'Consumer disputed?', 'Complaint ID']
+
+# product -> (share of complaints, sub_products in popularity order; None = no sub_product)
+PRODUCTS = {
+    'Credit reporting, credit repair services, or other personal consumer reports': (
+        0.25, ['Credit reporting', 'Other personal consumer report', 'Credit repair services']),
+    'Debt collection': (0.17, ['Other (i.e. phone, health club, etc.)', 'I do not know', 'Credit card debt',
+                               'Credit card', 'Medical debt', 'Medical', 'Other debt', 'Payday loan debt',
+                               'Payday loan', 'Auto debt', 'Auto', 'Mortgage debt', 'Mortgage',
+                               'Federal student loan debt', 'Non-federal student loan', 'Private student loan debt',
+                               'Federal student loan']),
+    'Mortgage': (0.15, ['Conventional fixed mortgage', 'Other mortgage', 'Conventional home mortgage',
+                        'Conventional adjustable mortgage (ARM)', 'FHA mortgage', 'Home equity loan or line of credit',
+                        'VA mortgage', 'Other type of mortgage', 'Home equity loan or line of credit (HELOC)',
+                        'Reverse mortgage', 'Second mortgage', 'USDA mortgage', 'Manufactured home loan']),
+    'Credit reporting': (0.10, [None]),
+    'Credit card': (0.05, [None]),
+    'Credit card or prepaid card': (0.05, ['General-purpose credit card or charge card', 'Store credit card',
+                                           'General-purpose prepaid card', 'Government benefit card',
+                                           'Payroll card', 'Gift card', 'Student prepaid card']),
+    'Bank account or service': (0.05, ['Checking account', 'Other bank product/service', 'Savings account',
+                                       '(CD) Certificate of deposit', 'Cashing a check without an account']),
+    'Checking or savings account': (0.04, ['Checking account', 'Other banking product or service',
+                                           'Savings account', 'CD (Certificate of Deposit)',
+                                           'Personal line of credit']),
+    'Student loan': (0.03, ['Federal student loan servicing', 'Private student loan', 'Non-federal student loan']),
+    'Consumer Loan': (0.02, ['Vehicle loan', 'Installment loan', 'Vehicle lease', 'Personal line of credit',
+                             'Pawn loan', 'Title loan']),
+    'Vehicle loan or lease': (0.015, ['Loan', 'Lease', 'Title loan']),
+    'Money transfer, virtual currency, or money service': (
+        0.01, ['Domestic (US) money transfer', 'International money transfer', 'Mobile or digital wallet',
+               'Check cashing service', "Money order, traveler's check or cashier's check",
+               'Foreign currency exchange', 'Virtual currency', 'Refund anticipation check', 'Debt settlement']),
+    'Payday loan, title loan, or personal loan': (0.01, ['Payday loan', 'Installment loan', 'Title loan',
+                                                         'Personal line of credit', 'Pawn loan']),
+    'Money transfers': (0.003, ['Domestic (US) money transfer', 'International money transfer']),
+    'Payday loan': (0.003, [None]),
+    'Prepaid card': (0.003, ['General purpose card', 'Gift or merchant card', 'Payroll card',
+                             'Government benefit payment card', 'ID prepaid card', 'Mobile wallet',
+                             'Other special purpose card', 'Transit card', 'Electronic Benefit Transfer / EBT card']),
+    'Other financial service': (0.001, ['Debt settlement', 'Credit repair', 'Check cashing', 'Money order',
+                                        'Foreign currency exchange', 'Refund anticipation check']),
+    'Virtual currency': (0.0002, ['Domestic (US) money transfer']),
+}
+
+REAL_ISSUES = ['Incorrect information on your report', 'Incorrect information on credit report',
+               "Problem with a credit reporting company's investigation into an existing problem",
+               'Improper use of your report', 'Loan servicing, payments, escrow account',
+               "Cont'd attempts collect debt not owed", 'Attempts to collect debt not owed',
+               'Trouble during payment process', 'Managing an account', 'Account opening, closing, or management']
+REAL_SUB_ISSUES = ['Information belongs to someone else', 'Account status', 'Account status incorrect',
+                   'Debt is not mine', 'Debt is not yours', 'Reporting company used your report improperly']
+
+N_ISSUES = 160
+N_SUB_ISSUES = 220
+N_COMPANIES = 6000
+ISSUES_PER_PRODUCT = 25
+BIG_COMPANIES = ['EQUIFAX, INC.', 'Experian Information Solutions Inc.', 'TRANSUNION INTERMEDIATE HOLDINGS, INC.']
+
+STATES = ['CA', 'FL', 'TX', 'NY', 'GA', 'IL', 'PA', 'NJ', 'NC', 'OH', 'MD', 'VA', 'MI', 'AZ', 'WA', 'MA', 'TN', 'CO',
+          'SC', 'NV', 'MO', 'IN', 'LA', 'AL', 'MN', 'CT', 'WI', 'OR', 'KY', 'OK', 'UT', 'DC', 'MS', 'AR', 'KS', 'DE',
+          'NM', 'IA', 'NH', 'HI', 'ID', 'NE', 'RI', 'ME', 'WV', 'MT', 'PR', 'AK', 'VT', 'SD', 'ND', 'WY', 'AE', 'AP',
+          'GU', 'VI', 'AA', 'MP', 'AS', 'FM', 'MH', 'PW', 'UNITED STATES MINOR OUTLYING ISLANDS']
+
+FIRST_DAY = np.datetime64('2011-12-01')
+LAST_DAY = np.datetime64('2020-06-30')
+DISPUTE_CUTOFF = np.datetime64('2017-04-24')  # the CFPB stopped asking whether consumers dispute the response
+
+WORDS = ('account credit report XXXX payment loan bank called told they would my the and to of was not '
+         'late fee interest balance dispute company information incorrect collection agency debt paid').split()
+
+CHUNK_ROWS = 250_000
+
+
+def _zipf(n, s=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+
+def _format_days(days):
+    """ %m/%d/%Y strings, formatting each distinct day once. """
+    uniques, inverse = np.unique(days, return_inverse=True)
+    return pd.to_datetime(uniques).strftime('%m/%d/%Y').to_numpy(object)[inverse]
+
+
+def _labels(rng):
+    """ Fixed label universe for a seed: issues and companies per product, sub_issues per issue. """
+    issues = REAL_ISSUES + [f'Issue {i:03d}' for i in range(N_ISSUES - len(REAL_ISSUES))]
+    sub_issues = REAL_SUB_ISSUES + [f'Sub-issue {i:03d}' for i in range(N_SUB_ISSUES - len(REAL_SUB_ISSUES))]
+    product_issues = [rng.choice(len(issues), ISSUES_PER_PRODUCT, replace=False) for _ in PRODUCTS]
+    # ~40% of issues have no sub_issues at all
+    issue_sub_issues = [rng.choice(len(sub_issues), rng.integers(1, 8), replace=False) if rng.random() < 0.6
+                        else np.array([], dtype=int) for _ in issues]
+    companies = BIG_COMPANIES + [f'COMPANY {i:04d} FINANCIAL, INC.' for i in range(N_COMPANIES)]
+    narratives = []
+    for _ in range(2000):
+        words = rng.choice(WORDS, rng.integers(20, 200))
+        text = ' '.join(words)
+        if rng.random() < 0.3:
+            text = text.replace(' told ', ' told "', 1) + '"\n\nThey said, again, "no".'
+        narratives.append(text)
+    return issues, sub_issues, product_issues, issue_sub_issues, companies, narratives
+
+
+def _chunk(rng, n, first_id, labels):
+    issues, sub_issues, product_issues, issue_sub_issues, companies, narratives = labels
+    products = list(PRODUCTS)
+    shares = np.array([share for share, _ in PRODUCTS.values()])
+
+    product = rng.choice(len(products), n, p=shares / shares.sum())
+    sub_product = np.empty(n, dtype=object)
+    issue = np.empty(n, dtype=np.int64)
+    for p, (_, subs) in enumerate(PRODUCTS.values()):
+        rows = np.flatnonzero(product == p)
+        sub_product[rows] = np.array(subs, dtype=object)[rng.choice(len(subs), len(rows), p=_zipf(len(subs)))]
+        issue[rows] = product_issues[p][rng.choice(ISSUES_PER_PRODUCT, len(rows), p=_zipf(ISSUES_PER_PRODUCT))]
+    sub_issue = np.full(n, None, dtype=object)
+    for i, subs in enumerate(issue_sub_issues):
+        rows = np.flatnonzero(issue == i)
+        if len(subs) and len(rows):
+            sub_issue[rows] = np.array(sub_issues, dtype=object)[subs[rng.choice(len(subs), len(rows),
+                                                                                 p=_zipf(len(subs)))]]
+
+    company = rng.choice(len(companies), n, p=_zipf(len(companies), 1.3))
+    bureau = (product == 0) | (product == 3)
+    company[bureau] = rng.integers(0, len(BIG_COMPANIES), bureau.sum())
+
+    # Complaint volume grows over time
+    n_days = int((LAST_DAY - FIRST_DAY).astype(int)) + 1
+    day = np.sort(np.floor(np.sqrt(rng.random(n)) * n_days).astype(int))
+    received = FIRST_DAY + day
+    sent = received + rng.integers(0, 4, n)
+
+    zips = np.char.zfill(rng.integers(500, 99999, n).astype(str), 5).astype(object)
+    masked = rng.random(n) < 0.25
+    zips[masked] = (pd.Series(zips[masked], dtype=object).str[:3] + 'XX').to_numpy()
+    zips[rng.random(n) < 0.01] = None
+    states = np.array(STATES, dtype=object)[rng.choice(len(STATES), n, p=_zipf(len(STATES), 0.9))]
+    states[rng.random(n) < 0.015] = None
+
+    narrative = np.full(n, None, dtype=object)
+    has_narrative = rng.random(n) < 0.35
+    narrative[has_narrative] = np.array(narratives, dtype=object)[rng.integers(0, len(narratives),
+                                                                               has_narrative.sum())]
+    disputed = np.where(rng.random(n) < 0.2, 'Yes', 'No').astype(object)
+    disputed[received >= DISPUTE_CUTOFF] = None
+
+    def pick(options, p=None):
+        return np.array(options, dtype=object)[rng.choice(len(options), n, p=p)]
+
+    return pd.DataFrame({
+        'Date received': _format_days(received),
+        'Product': np.array(products, dtype=object)[product],
+        'Sub-product': sub_product,
+        'Issue': np.array(issues, dtype=object)[issue],
+        'Sub-issue': sub_issue,
+        'Consumer complaint narrative': narrative,
+        'Company public response': pick([None, 'Company has responded to the consumer and the CFPB and chooses '
+                                               'not to provide a public response',
+                                         'Company believes it acted appropriately as authorized by contract or law'],
+                                        [0.6, 0.3, 0.1]),
+        'Company': np.array(companies, dtype=object)[company],
+        'State': states,
+        'Zip code': zips,
+        'Tags': pick([None, 'Older American', 'Servicemember', 'Older American, Servicemember'],
+                     [0.85, 0.08, 0.06, 0.01]),
+        'Consumer consent provided?': pick(['Consent provided', 'Consent not provided', 'Other', None],
+                                           [0.35, 0.3, 0.05, 0.3]),
+        'Submitted via': pick(['Web', 'Referral', 'Phone', 'Postal mail', 'Fax', 'Email'],
+                              [0.7, 0.15, 0.08, 0.05, 0.015, 0.005]),
+        'Date sent to company': _format_days(sent),
+        'Company response to consumer': pick(['Closed with explanation', 'Closed with non-monetary relief',
+                                              'Closed with monetary relief', 'In progress', 'Closed',
+                                              'Untimely response', 'Closed without relief', 'Closed with relief'],
+                                             [0.7, 0.12, 0.06, 0.03, 0.03, 0.02, 0.02, 0.02]),
+        'Timely response?': pick(['Yes', 'No'], [0.97, 0.03]),
+        'Consumer disputed?': disputed,
+        'Complaint ID': np.arange(first_id, first_id + n),
+    }, columns=HEADER)
+
+
+def generate_complaints(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write a synthetic export with `n_rows` complaints to `path`.
+
+    Arguments:
+        path (str): Output CSV.
+        n_rows (int): Number of complaints.
+        seed (int): Random seed; the same (n_rows, seed) always produces the same file.
+        chunk_rows (int): Rows generated and written at a time, which bounds memory use.
+    """
+    rng = np.random.default_rng(seed)
+    labels = _labels(rng)
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(HEADER) + '\n')
+        for start in range(0, n_rows, chunk_rows):
+            chunk = _chunk(rng, min(chunk_rows, n_rows - start), 1_000_000 + start, labels)
+            chunk.to_csv(f, header=False, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic Consumer_Complaints.csv.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate_complaints(args.path, args.rows, args.seed)
@@ -0,0 +1,124 @@
+""" Time and memory-profile each stage of the cleaning pipeline on synthetic exports.
+
+    python -m benchmarks.run                       # 10K and 1M rows
+    python -m benchmarks.run --sizes 10m --legacy  # also time the original read_csv/drop/rename path
+
+Synthetic CSVs are generated once per (size, seed) into benchmarks/data/. Results are
+written as JSON (one record per size, with per-stage wall time, Python peak allocation and
+process peak RSS) for regression tracking.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+from benchmarks.generate import generate_complaints
+from cfpb import COLUMN_NAMES, UNNECESSARY_COLS, ComplaintCube, GeoIndex, load_complaints, summary_tables
+from cfpb.clean import parse_dates
+from cfpb.labels import normalize_labels
+from cfpb.profiling import peak_rss_mb
+from cfpb.recategorize import recategorize_products
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def _time_stage(results, name, func, *args, trace_memory=True):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = func(*args)
+    seconds = time.perf_counter() - start
+    rss = peak_rss_mb()
+    record = {'stage': name, 'seconds': round(seconds, 4), 'peak_rss_mb': None if rss is None else round(rss, 1)}
+    if trace_memory:
+        record['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+        tracemalloc.stop()
+    results.append(record)
+    return value
+
+
+def _legacy_load(path):
+    return pd.read_csv(path, low_memory=False)
+
+
+def _legacy_drop_rename(complaints):
+    complaints.drop(UNNECESSARY_COLS, axis=1, inplace=True)
+    complaints.rename(columns=COLUMN_NAMES, inplace=True)
+    return complaints
+
+
+def _plot(products):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.bar(products.index.astype(str), products['perc_total'])
+    fig.savefig(io.BytesIO(), format='png')
+    plt.close(fig)
+
+
+def benchmark(path, legacy=False, trace_memory=True):
+    """ Run every stage on the CSV at `path` and return one record per stage. """
+    stages = []
+    if legacy:
+        raw = _time_stage(stages, 'legacy_read_csv', _legacy_load, path, trace_memory=trace_memory)
+        _time_stage(stages, 'legacy_drop_rename', _legacy_drop_rename, raw, trace_memory=trace_memory)
+        del raw
+
+    # load_complaints prunes and renames columns while reading, so it covers load + drop/rename
+    complaints = _time_stage(stages, 'load', load_complaints, path, trace_memory=trace_memory)
+    rows = len(complaints)
+    _time_stage(stages, 'date_parse', parse_dates, complaints, trace_memory=trace_memory)
+    _time_stage(stages, 'relabel', normalize_labels, complaints, trace_memory=trace_memory)
+    _time_stage(stages, 'resort', recategorize_products, complaints, trace_memory=trace_memory)
+    tables = _time_stage(stages, 'aggregate', lambda df: summary_tables(ComplaintCube.from_frame(df)), complaints,
+                         trace_memory=trace_memory)
+    _time_stage(stages, 'plot', _plot, tables['products'], trace_memory=trace_memory)
+    # The synthetic zips share 3-digit prefixes ('10001', '100XX'), as real exports do
+    _time_stage(stages, 'geo', GeoIndex.from_frame, complaints, trace_memory=trace_memory)
+    for stage in stages:
+        stage['rows'] = rows
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['10k', '1m'], choices=list(SIZES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--legacy', action='store_true', help='also time the original read_csv/drop/rename path')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc, which slows the stages down')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args(argv)
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    results = {
+        'python': platform.python_version(), 'pandas': pd.__version__, 'platform': platform.platform(),
+        'cpus': os.cpu_count(), 'seed': args.seed, 'runs': [],
+    }
+    for size in args.sizes:
+        path = os.path.join(DATA_DIR, f'complaints-{size}-seed{args.seed}.csv')
+        if not os.path.exists(path):
+            generate_complaints(path, SIZES[size], args.seed)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            stages = benchmark(path, legacy=args.legacy, trace_memory=not args.no_memory)
+        results['runs'].append({'size': size, 'rows': SIZES[size], 'stages': stages})
+        for stage in stages:
+            rss = '' if stage['peak_rss_mb'] is None else f"  rss {stage['peak_rss_mb']:>8.1f} MB"
+            print(f"{size:>4} {stage['stage']:<20} {stage['seconds']:>9.3f}s{rss}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
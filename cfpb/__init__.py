@@ -0,0 +1,83 @@
+""" Helpers for loading and cleaning the CFPB Consumer Complaint Database.
+
+The analysis itself lives in Consumer_complaints.py; this package holds the
+reusable pieces so they can run on the full multi-GB export. `python -m cfpb`
+runs them from the command line (see cfpb.cli).
+
+Names are imported from their submodules on first use, so importing cfpb (or
+running the CLI) only loads what a command actually needs; matplotlib in
+particular is only imported when charts are rendered.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'CUBE_COLS': 'cfpb.aggregate',
+    'complaint_shares': 'cfpb.aggregate',
+    'ComplaintCube': 'cfpb.aggregate',
+    'count_cube': 'cfpb.aggregate',
+    'merge_counts': 'cfpb.aggregate',
+    'summary_tables': 'cfpb.aggregate',
+    'load_clean_complaints': 'cfpb.cache',
+    'ColumnStore': 'cfpb.columnar',
+    'load_column_store': 'cfpb.columnar',
+    'write_columns': 'cfpb.columnar',
+    'clean_complaints': 'cfpb.clean',
+    'malformed_dates': 'cfpb.clean',
+    'parse_dates': 'cfpb.clean',
+    'CompanyStats': 'cfpb.companies',
+    'GeoIndex': 'cfpb.geo',
+    'normalize_geography': 'cfpb.geo',
+    'load_store': 'cfpb.incremental',
+    'load_store_cube': 'cfpb.incremental',
+    'load_store_sketches': 'cfpb.incremental',
+    'refresh': 'cfpb.incremental',
+    'LABEL_MAP': 'cfpb.labels',
+    'LabelNormalizer': 'cfpb.labels',
+    'normalize_labels': 'cfpb.labels',
+    'COLUMN_NAMES': 'cfpb.load',
+    'UNNECESSARY_COLS': 'cfpb.load',
+    'iter_complaints': 'cfpb.load',
+    'load_complaints': 'cfpb.load',
+    'NarrativeIndex': 'cfpb.narratives',
+    'build_narrative_index': 'cfpb.narratives',
+    'out_of_core_summary': 'cfpb.outofcore',
+    'streaming_count_cube': 'cfpb.outofcore',
+    'streaming_sketches': 'cfpb.outofcore',
+    'parallel_clean_complaints': 'cfpb.parallel',
+    'parallel_count_cube': 'cfpb.parallel',
+    'parallel_sketches': 'cfpb.parallel',
+    'profiling': 'cfpb.profiling',
+    'INDEX_COLS': 'cfpb.query',
+    'ComplaintIndex': 'cfpb.query',
+    'PRODUCT_RULES': 'cfpb.recategorize',
+    'recategorize_products': 'cfpb.recategorize',
+    'render_charts': 'cfpb.report',
+    'render_report': 'cfpb.report',
+    'CATEGORY_COLS': 'cfpb.schema',
+    'apply_schema': 'cfpb.schema',
+    'codes_and_uniques': 'cfpb.schema',
+    'concat_frames': 'cfpb.schema',
+    'value_counts': 'cfpb.schema',
+    'ComplaintSketches': 'cfpb.sketch',
+    'merge_sketches': 'cfpb.sketch',
+    'ComplaintTimeSeries': 'cfpb.timeseries',
+    'ValidationError': 'cfpb.validate',
+    'Validator': 'cfpb.validate',
+    'null_rates': 'cfpb.validate',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module = importlib.import_module(_EXPORTS[name])
+    value = module if module.__name__ == f'{__name__}.{name}' else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
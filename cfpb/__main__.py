@@ -0,0 +1,3 @@
+from cfpb.cli import main
+
+main()
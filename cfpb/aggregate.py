@@ -0,0 +1,126 @@
+""" One-shot complaint count cube for the reporting cells.
+
+A single groupby over (product, sub_product, issue, sub_issue) replaces the dozens of
+boolean-mask + value_counts() scans in the notebook. Every breakdown the report needs
+(sub_products of a product, issues of a product, sub_issues of an issue, ...) is a
+re-aggregation of that small cube, built once per (column, filter column) pair and then
+looked up by label.
+"""
+
+import numpy as np
+import pandas as pd
+
+from cfpb.profiling import profiled
+
+CUBE_COLS = ['product', 'sub_product', 'issue', 'sub_issue']
+
+
+def _sorted_counts(counts):
+    """ Order like value_counts(): largest first, without NaN labels. Ties are ordered by label. """
+    counts = counts[counts.index.notna() & (counts > 0)]
+    order = np.lexsort((counts.index.astype(str), -counts.to_numpy()))
+    return counts.iloc[order].rename('count')
+
+
+class ComplaintCube:
+    """Complaint counts for every (product, sub_product, issue, sub_issue) combination.
+
+    Arguments:
+        counts (pandas.Series): Counts indexed by CUBE_COLS, as returned by count_cube().
+    """
+
+    def __init__(self, counts):
+        self.counts = counts
+        self._totals = {}
+        self._breakdowns = {}
+
+    @classmethod
+    @profiled('count_cube')
+    def from_frame(cls, df):
+        return cls(count_cube(df))
+
+    def totals(self, column):
+        """ Equivalent of df[column].value_counts(). """
+        if column not in self._totals:
+            self._totals[column] = _sorted_counts(self.counts.groupby(level=column, observed=True).sum())
+        return self._totals[column]
+
+    def breakdown(self, column, **where):
+        """Equivalent of df.loc[df[key] == value, column].value_counts() for where={key: value}.
+
+        With a single filter the answer is a dictionary lookup into a table built the first
+        time that (column, key) pair is requested. Several filters are answered from the cube
+        itself, which is still far smaller than the frame.
+        """
+        if not where:
+            return self.totals(column)
+        if len(where) == 1:
+            (key, value), = where.items()
+            if key == column:
+                totals = self.totals(column)
+                return totals[totals.index == value]
+            if (column, key) not in self._breakdowns:
+                grouped = self.counts.groupby(level=[key, column], observed=True).sum()
+                self._breakdowns[column, key] = {
+                    label: _sorted_counts(group.droplevel(key))
+                    for label, group in grouped.groupby(level=key, observed=True)
+                }
+            empty = pd.Series([], dtype='int64', name='count', index=pd.Index([], name=column))
+            return self._breakdowns[column, key].get(value, empty)
+        mask = pd.Series(True, index=self.counts.index)
+        for key, value in where.items():
+            mask &= self.counts.index.get_level_values(key) == value
+        return _sorted_counts(self.counts[mask].groupby(level=column, observed=True).sum())
+
+    def sub_products(self, product):
+        return self.breakdown('sub_product', product=product)
+
+    def issues(self, product):
+        return self.breakdown('issue', product=product)
+
+    def sub_issues(self, issue):
+        return self.breakdown('sub_issue', issue=issue)
+
+
+def count_cube(df):
+    """ Complaint counts per (product, sub_product, issue, sub_issue), from one groupby over df. """
+    return df.groupby(CUBE_COLS, observed=True, dropna=False).size()
+
+
+def merge_counts(parts):
+    """ Add up count Series indexed by CUBE_COLS (negative parts subtract). """
+    parts = [part.rename('count').reset_index() for part in parts if len(part)]
+    if not parts:
+        return pd.Series([], dtype='int64', name='count',
+                         index=pd.MultiIndex.from_arrays([[]] * len(CUBE_COLS), names=CUBE_COLS))
+    frame = pd.concat([part.astype({col: object for col in CUBE_COLS}) for part in parts], ignore_index=True)
+    counts = frame.groupby(CUBE_COLS, dropna=False)['count'].sum()
+    return counts[counts != 0]
+
+
+def complaint_shares(counts):
+    """ Frame of 'num_complaints' and 'perc_total' (share of all complaints) from a Series of counts. """
+    # Otherwise counts is a series and additional column cannot be added
+    shares = counts.to_frame()
+    shares.columns = ['num_complaints']
+    shares['perc_total'] = shares['num_complaints'] / shares['num_complaints'].sum()
+    return shares
+
+
+@profiled('summary_tables')
+def summary_tables(cube):
+    """The report tables of the notebook, from a ComplaintCube.
+
+    Returns:
+        dict: 'products' and 'sub_products' (complaint_shares() frames), and
+            'sub_products_by_product', 'issues' and 'sub_issues' mapping each product to its
+            sub_product / issue / sub_issue counts.
+    """
+    products = cube.totals('product')
+    return {
+        'products': complaint_shares(products),
+        'sub_products': complaint_shares(cube.totals('sub_product')),
+        'sub_products_by_product': {product: cube.sub_products(product) for product in products.index},
+        'issues': {product: cube.issues(product) for product in products.index},
+        'sub_issues': {product: cube.breakdown('sub_issue', product=product) for product in products.index},
+    }
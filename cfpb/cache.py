@@ -0,0 +1,170 @@
+""" Persistent Parquet cache of the cleaned complaints frame.
+
+Cache entries are keyed on the source file(s) (size, mtime and a content hash) and on a
+fingerprint of the cleaning rules, so they invalidate themselves when either the export
+or the rules change. Hashing a multi-GB export takes a few seconds, so the hash is
+remembered next to the cache and only recomputed when the file's size or mtime changes.
+
+Parquet needs pyarrow; without it the frame is rebuilt on every call.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import warnings
+
+import pandas as pd
+
+from cfpb import clean, labels, load, recategorize, schema
+from cfpb.clean import clean_complaints
+from cfpb.load import load_complaints
+
+CACHE_DIR = '.cfpb_cache'
+
+# Bump when a cleaning step changes in a way the rule tables below don't capture
+CLEANING_VERSION = 3
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def rules_version():
+    """ Fingerprint of everything that determines the cleaned frame besides the source data. """
+    rules = [CLEANING_VERSION, load.COLUMN_NAMES, schema.CATEGORY_COLS, schema.STRING_COLS, schema.STRING_DTYPE,
+             schema.DISPUTED_VALUES, clean.DATE_FORMAT, labels.LABEL_MAP, recategorize.PRODUCT_RULES]
+    return hashlib.sha256(repr(rules).encode()).hexdigest()[:16]
+
+
+def _hash_file(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path, cache_dir=CACHE_DIR):
+    """Return {'size', 'mtime', 'hash'} for the file at `path`.
+
+    The content hash is reused from the last call when size and mtime are unchanged.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    manifest_path = os.path.join(cache_dir, 'sources.json')
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    source = os.path.abspath(path)
+    known = manifest.get(source, {})
+    if known.get('size') == fingerprint['size'] and known.get('mtime') == fingerprint['mtime']:
+        fingerprint['hash'] = known['hash']
+    else:
+        fingerprint['hash'] = _hash_file(path)
+        manifest[source] = fingerprint
+        os.makedirs(cache_dir, exist_ok=True)
+        atomic_write(manifest_path, lambda tmp: write_json(manifest, tmp))
+    return fingerprint
+
+
+def _source_files(path):
+    """ The distinct files behind `path`, in order; a .zip counts once however many CSVs it holds. """
+    return list(dict.fromkeys(source.path for source in load.complaint_sources(path)))
+
+
+def cache_key(path, cache_dir=CACHE_DIR):
+    fingerprints = [source_fingerprint(file, cache_dir) for file in _source_files(path)]
+    key = '-'.join(f"{fingerprint['size']}-{fingerprint['hash']}" for fingerprint in fingerprints)
+    key = f'{key}-{rules_version()}'
+    return hashlib.sha256(key.encode()).hexdigest()[:24]
+
+
+def _stem(path):
+    """ Cache file name prefix: the source's name without extensions, or one per set of files. """
+    files = _source_files(path)
+    if len(files) > 1:
+        names = '\0'.join(os.path.abspath(file) for file in files)
+        return f'combined-{hashlib.sha256(names.encode()).hexdigest()[:8]}'
+    name = os.path.basename(files[0])
+    for ext in ('.zip', '.gz', '.bz2', '.xz', '.zst'):
+        if name.lower().endswith(ext):
+            name = name[:-len(ext)]
+            break
+    return os.path.splitext(name)[0]
+
+
+def write_json(obj, path):
+    with open(path, 'w') as f:
+        json.dump(obj, f)
+
+
+def atomic_write(path, write):
+    """ Write through a temporary file so readers never see a half-written cache entry. """
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def atomic_replace_dir(path, write):
+    """Build a directory with write(tmp_dir), then swap it in for the one at `path`.
+
+    The old directory is moved aside before the new one is renamed into place and only deleted
+    after that, so `path` is missing for the time of one rename rather than for as long as the
+    old directory takes to delete. If the swap fails, the old directory is put back.
+    """
+    tmp, old = f'{path}.{os.getpid()}.tmp', f'{path}.{os.getpid()}.old'
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        write(tmp)
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(old) and not os.path.exists(path):
+            os.replace(old, path)
+        shutil.rmtree(old, ignore_errors=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_clean_complaints(path='Consumer_Complaints.csv', cache_dir=CACHE_DIR, columns=None):
+    """Return the fully cleaned complaints frame, from the cache when it is up to date.
+
+    Arguments:
+        path (str or list): CSV export from the Consumer Complaint Database, or several
+            (possibly compressed) files; see cfpb.load.complaint_sources().
+        cache_dir (str): Directory holding the cache; None disables caching.
+        columns (list): Only return these columns. A cache hit then only reads them from disk.
+    """
+    if cache_dir is None:
+        return _select(clean_complaints(load_complaints(path)), columns)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        warnings.warn('pyarrow is not installed; the cleaned complaints frame will not be cached')
+        return _select(clean_complaints(load_complaints(path)), columns)
+
+    stem = _stem(path)
+    cache_path = os.path.join(cache_dir, f'{stem}.{cache_key(path, cache_dir)}.parquet')
+    if os.path.exists(cache_path):
+        return schema.apply_schema(pd.read_parquet(cache_path, columns=columns))
+
+    complaints = clean_complaints(load_complaints(path))
+    atomic_write(cache_path, lambda tmp: complaints.to_parquet(tmp, index=False))
+
+    # Entries for older versions of this source or of the rules are never read again
+    for name in os.listdir(cache_dir):
+        if name.endswith('.parquet') and name.rsplit('.', 2)[0] == stem and name != os.path.basename(cache_path):
+            os.remove(os.path.join(cache_dir, name))
+    return _select(complaints, columns)
+
+
+def _select(df, columns):
+    return df if columns is None else df[columns]
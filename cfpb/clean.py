@@ -0,0 +1,80 @@
+""" Cleaning steps from Clean Data (A)-(C), as functions over the loaded complaints frame.
+
+The notebook calls the steps one at a time between its investigation cells;
+clean_complaints() runs the whole chain in the same order.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from cfpb.labels import normalize_labels
+from cfpb.profiling import stage
+from cfpb.recategorize import recategorize_products
+from cfpb.schema import codes_and_uniques
+from cfpb.validate import Validator
+
+DATE_FORMAT = '%m/%d/%Y'
+
+
+def malformed_dates(values, dates=None):
+    """Count of each non-empty value in `values` that doesn't parse with DATE_FORMAT, most
+    frequent first. `dates` are the already parsed `values`, if at hand.
+    """
+    dates = _to_dates(values) if dates is None else dates
+    bad = values[values.notna().to_numpy() & np.isnat(dates)]
+    return bad.astype(object).value_counts()
+
+
+def _to_dates(values):
+    """Parse a column of date strings into a datetime64 array, one distinct string at a time.
+
+    A multi-million row export only has a few thousand distinct dates, so each distinct string
+    is parsed once and the results are broadcast back to the rows through their codes. Values
+    that don't match DATE_FORMAT become NaT.
+    """
+    codes, uniques = codes_and_uniques(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=DATE_FORMAT, errors='coerce').to_numpy()
+    # code -1 (missing) picks up the trailing NaT
+    return np.append(parsed, np.datetime64('NaT', 'ns'))[codes]
+
+
+def parse_dates(df, strict=False):
+    """Convert 'date_received' to datetime64, in place.
+
+    Unlike to_datetime(errors='ignore'), a bad value doesn't leave the whole column as strings:
+    malformed dates become NaT and are reported with a warning (see malformed_dates()), or raise
+    ValueError when `strict`.
+    """
+    with stage('parse_dates', len(df)) as record:
+        record.rows_out = len(df)
+        values = df['date_received']
+        if pd.api.types.is_datetime64_any_dtype(values):
+            record.rows_modified = 0
+            return df
+        dates = _to_dates(values)
+        malformed = malformed_dates(values, dates)
+        if len(malformed):
+            examples = malformed.index[:5].tolist()
+            message = f"{malformed.sum()} date_received values don't match {DATE_FORMAT!r}, e.g. {examples}"
+            if strict:
+                raise ValueError(message)
+            warnings.warn(f'{message}; they were set to NaT')
+        df['date_received'] = dates
+        record.rows_modified = int((~np.isnat(dates)).sum())
+    return df
+
+
+def clean_complaints(df, validate=True):
+    """Run every cleaning step on a frame from load_complaints(), in place, and return it.
+
+    With `validate`, the frame is checked on the way in and after every step (see cfpb.validate);
+    the first step that breaks it raises ValidationError.
+    """
+    validator = Validator(df) if validate else None
+    for step in (parse_dates, normalize_labels, recategorize_products):
+        step(df)
+        if validator is not None:
+            validator.check(df, step.__name__)
+    return df
@@ -0,0 +1,194 @@
+""" Command-line entry point: python -m cfpb <command> ...
+
+    ingest     bring the incremental store up to date with a new export
+    clean      load and clean an export (through the Parquet cache), optionally writing it out
+    aggregate  complaint counts by product, sub_product, issue or sub_issue (or approximate ones)
+    report     render the report charts to files
+    narratives build the narrative search index, search it or list top terms
+
+Each command imports only the modules it needs, after the arguments are parsed.
+"""
+
+import argparse
+import json
+import sys
+
+CUBE_COLUMNS = ['product', 'sub_product', 'issue', 'sub_issue']
+DEFAULT_EXPORT = 'Consumer_Complaints.csv'
+
+
+def _ingest(args):
+    from cfpb.incremental import refresh
+
+    print(json.dumps(refresh(args.path, args.store)))
+
+
+def _clean(args):
+    if args.workers:
+        from cfpb.parallel import parallel_clean_complaints
+        complaints = parallel_clean_complaints(args.path, workers=args.workers)
+    else:
+        from cfpb.cache import load_clean_complaints
+        complaints = load_clean_complaints(args.path, args.cache_dir)
+    if args.output is None:
+        print(f'{len(complaints)} complaints')
+    elif args.output.endswith('.csv'):
+        complaints.to_csv(args.output, index=False)
+    else:
+        complaints.to_parquet(args.output, index=False)
+
+
+def _cube(args):
+    from cfpb.aggregate import ComplaintCube
+
+    if args.store:
+        from cfpb.incremental import load_store_cube
+        return load_store_cube(args.store)
+    if args.column_store:
+        from cfpb.columnar import load_column_store
+        return load_column_store(args.path, args.column_store, args.cache_dir).cube()
+    if args.out_of_core:
+        from cfpb.outofcore import streaming_count_cube
+        return ComplaintCube(streaming_count_cube(args.path))
+    from cfpb.cache import load_clean_complaints
+    return ComplaintCube.from_frame(load_clean_complaints(args.path, args.cache_dir, columns=CUBE_COLUMNS))
+
+
+def _aggregate(args):
+    where = {key: value for key, value in [('product', args.product), ('issue', args.issue)] if value is not None}
+    if args.approximate:
+        from cfpb.incremental import load_store_sketches
+        sketches = load_store_sketches(args.store or '.cfpb_store')
+        if args.distinct:
+            print(sketches.distinct(args.by, **where))
+            return
+        counts = sketches.value_counts(args.by, args.top, **where)
+    else:
+        counts = _cube(args).breakdown(args.by, **where)
+    if args.top:
+        counts = counts.head(args.top)
+    if args.json:
+        print(json.dumps({str(label): int(count) for label, count in counts.items()}))
+    else:
+        print(counts.to_string())
+
+
+def _report(args):
+    from cfpb.report import render_report
+
+    paths = render_report(_cube(args), args.out_dir, tuple(args.formats), args.workers)
+    print(f'{len(paths)} files written to {args.out_dir}')
+
+
+def _narratives(args):
+    import os
+
+    from cfpb.narratives import NarrativeIndex, build_narrative_index
+
+    if args.rebuild or not os.path.isdir(args.index_dir):
+        index = build_narrative_index(args.path, args.index_dir)
+    else:
+        index = NarrativeIndex(args.index_dir)
+    if args.search:
+        print(index.search(args.search, args.product, args.issue, args.limit).to_string(index=False))
+    else:
+        print(index.top_terms(args.limit or 20, args.product, args.issue).to_string())
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='python -m cfpb', description='CFPB consumer complaint pipeline.')
+    parser.add_argument('--profile', action='store_true', help='print per-stage timings to stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def command(name, func, help):
+        sub = commands.add_parser(name, help=help)
+        sub.add_argument('path', nargs='*',
+                         help=f'CFPB export: CSV, compressed CSV or .zip; several files or glob patterns '
+                              f'are read as one (default: {DEFAULT_EXPORT})')
+        sub.set_defaults(func=func)
+        return sub
+
+    def cube_options(sub):
+        sub.add_argument('--cache-dir', default='.cfpb_cache', help='cleaned-frame cache directory')
+        source = sub.add_mutually_exclusive_group()
+        source.add_argument('--store', help='read the counts from an incremental store instead of the CSV')
+        source.add_argument('--out-of-core', action='store_true', help='stream the CSV in bounded memory')
+        source.add_argument('--column-store', nargs='?', const='.cfpb_columns',
+                            help='count from the memory-mapped column store (built from the export when stale)')
+
+    sub = command('ingest', _ingest, 'update the incremental store from an export')
+    sub.add_argument('--store', default='.cfpb_store')
+
+    sub = command('clean', _clean, 'load and clean an export')
+    sub.add_argument('--cache-dir', default='.cfpb_cache')
+    sub.add_argument('--workers', type=int, help='clean in this many processes (bypasses the cache)')
+    sub.add_argument('-o', '--output', help='write the cleaned frame (.parquet or .csv)')
+
+    sub = command('aggregate', _aggregate, 'complaint counts')
+    cube_options(sub)
+    sub.add_argument('--by', default='product', choices=CUBE_COLUMNS + ['company', 'state'],
+                     help='company and state need --approximate')
+    sub.add_argument('--product')
+    sub.add_argument('--issue')
+    sub.add_argument('--top', type=int)
+    sub.add_argument('--json', action='store_true')
+    sub.add_argument('--approximate', action='store_true',
+                     help='answer from the sketches kept by ingest (the --store, default .cfpb_store); '
+                          'counts are upper bounds, see cfpb.sketch')
+    sub.add_argument('--distinct', action='store_true', help='with --approximate: number of distinct --by labels')
+
+    sub = command('report', _report, 'render the report charts')
+    cube_options(sub)
+    sub.add_argument('--out-dir', default='report')
+    sub.add_argument('--formats', nargs='+', default=['png', 'svg'])
+    sub.add_argument('--workers', type=int)
+
+    sub = command('narratives', _narratives, 'search complaint narratives (builds the index on first use)')
+    sub.add_argument('--index-dir', default='.cfpb_narratives')
+    sub.add_argument('--rebuild', action='store_true', help='re-index the export')
+    sub.add_argument('--search', help='words and "quoted phrases" that must all occur; without it, list top terms')
+    sub.add_argument('--product')
+    sub.add_argument('--issue')
+    sub.add_argument('--limit', type=int)
+    return parser
+
+
+def _check_aggregate(parser, args):
+    """ Reject options the chosen source can't answer, before anything is loaded. """
+    if args.approximate:
+        from cfpb.sketch import SKETCH_COLS, SKETCH_PAIRS
+
+        if args.path or args.column_store or args.out_of_core:
+            parser.error("--approximate answers from the sketches ingest keeps in --store (default .cfpb_store); "
+                         "it doesn't read an export")
+        if args.product is not None and args.issue is not None:
+            parser.error('--approximate takes at most one of --product and --issue')
+        key = 'product' if args.product is not None else 'issue' if args.issue is not None else None
+        if key is None and args.by not in SKETCH_COLS:
+            parser.error(f"--approximate can't count --by {args.by}; sketched: {', '.join(SKETCH_COLS)}")
+        if key is not None and (key, args.by) not in SKETCH_PAIRS:
+            by = sorted(column for pair_key, column in SKETCH_PAIRS if pair_key == key)
+            parser.error(f"--approximate can't count --by {args.by} within one --{key}; try --by {' or '.join(by)}")
+        return
+    if args.by not in CUBE_COLUMNS:
+        parser.error(f"--by {args.by} needs --approximate; the count cube has {', '.join(CUBE_COLUMNS)}")
+    if args.distinct:
+        parser.error('--distinct needs --approximate')
+
+
+def main(argv=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command == 'aggregate':
+        _check_aggregate(parser, args)
+    args.path = args.path or [DEFAULT_EXPORT]
+    if args.profile:
+        from cfpb import profiling
+        profiling.enable()
+    args.func(args)
+    if args.profile:
+        profiling.report(file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
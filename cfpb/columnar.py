@@ -0,0 +1,189 @@
+""" Memory-mapped columnar copy of the cleaned complaints, shared by any number of processes.
+
+write_columns() stores each label column as a fixed-width array of category codes (int8,
+int16 or int32, as pandas chose them) next to a small dictionary of its labels, and
+date_received as int32 days since 1970-01-01:
+
+    columns.json            row count, stored columns and the key of the export they came from
+    <column>.npy            category codes (-1 = missing) or days (DAY_MISSING = NaT)
+    <column>.labels.json    the label of each code
+
+ColumnStore opens the arrays with np.load(mmap_mode='r'). Opening reads only the JSON files,
+whatever the size of the data; processes reading the same store share one copy of it in the
+OS page cache; and the columns handed out are categoricals over the mapped codes, not copies.
+Counts are computed on the codes themselves (np.bincount), so value_counts() and the
+ComplaintCube of the report never materialize a frame.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_list_like
+
+from cfpb.aggregate import CUBE_COLS, ComplaintCube, _sorted_counts
+from cfpb.cache import CACHE_DIR, atomic_replace_dir, cache_key, load_clean_complaints
+from cfpb.profiling import profiled
+from cfpb.query import INDEX_COLS
+
+COLUMN_DIR = '.cfpb_columns'
+DATE_COLUMN = 'date_received'
+STORE_COLS = INDEX_COLS + [DATE_COLUMN]
+
+DAY_MISSING = np.iinfo(np.int32).min
+
+
+@profiled('column_store', details=lambda store: {'rows': len(store)})
+def write_columns(df, store_dir=COLUMN_DIR, columns=STORE_COLS, key=None):
+    """Write `columns` of the cleaned frame `df` to `store_dir`, replacing any previous store.
+
+    Arguments:
+        df (pandas.DataFrame): The cleaned complaints.
+        store_dir (str): Store directory.
+        columns (list): Label columns and/or DATE_COLUMN to store.
+        key (str): Identifies the source of `df` (see load_column_store()).
+
+    Returns:
+        ColumnStore: The new store.
+    """
+    def write(tmp_dir):
+        for col in columns:
+            if col == DATE_COLUMN:
+                dates = df[col].to_numpy('datetime64[D]')
+                days = np.where(np.isnat(dates), DAY_MISSING, dates.astype(np.int64)).astype(np.int32)
+                np.save(os.path.join(tmp_dir, f'{col}.npy'), days)
+                continue
+            values = df[col].astype('category').cat
+            np.save(os.path.join(tmp_dir, f'{col}.npy'), values.codes.to_numpy())
+            with open(os.path.join(tmp_dir, f'{col}.labels.json'), 'w') as f:
+                json.dump(values.categories.tolist(), f)
+        with open(os.path.join(tmp_dir, 'columns.json'), 'w') as f:
+            json.dump({'rows': len(df), 'columns': list(columns), 'key': key}, f)
+
+    atomic_replace_dir(store_dir, write)
+    return ColumnStore(store_dir)
+
+
+def load_column_store(path='Consumer_Complaints.csv', store_dir=COLUMN_DIR, cache_dir=CACHE_DIR):
+    """Open the column store of the export at `path`, (re)building it when the export or the
+    cleaning rules changed since it was written.
+
+    Arguments:
+        path (str or list): Export file(s); see cfpb.load.complaint_sources().
+        store_dir (str): Store directory.
+        cache_dir (str): Cleaned-frame cache used for rebuilding (see cfpb.cache).
+    """
+    key = cache_key(path, cache_dir or CACHE_DIR)
+    try:
+        store = ColumnStore(store_dir)
+    except (OSError, ValueError):
+        store = None
+    if store is not None and store.key == key:
+        return store
+    return write_columns(load_clean_complaints(path, cache_dir, columns=STORE_COLS), store_dir, key=key)
+
+
+class ColumnStore:
+    """Read-only, memory-mapped columns written by write_columns().
+
+    Filters are given as keyword arguments, column=label, as in ComplaintIndex: a label, a
+    list of labels (any of them matches) or None (the value is missing).
+
+    Arguments:
+        store_dir (str): Store directory.
+    """
+
+    def __init__(self, store_dir=COLUMN_DIR):
+        with open(os.path.join(store_dir, 'columns.json')) as f:
+            meta = json.load(f)
+        self.store_dir = store_dir
+        self.key = meta['key']
+        self.columns = meta['columns']
+        self._rows = meta['rows']
+        self.categories = {}
+        self._arrays = {}
+        for col in self.columns:
+            if col != DATE_COLUMN:
+                with open(os.path.join(store_dir, f'{col}.labels.json')) as f:
+                    self.categories[col] = pd.Index(json.load(f), dtype=object)
+            array = os.path.join(store_dir, f'{col}.npy')
+            # numpy can't map a zero-length array
+            self._arrays[col] = np.load(array, mmap_mode='r' if self._rows else None)
+
+    def __len__(self):
+        return self._rows
+
+    def codes(self, column):
+        """ The mapped category codes of a label column (-1 = missing). """
+        if column not in self.categories:
+            raise KeyError(f'{column!r} is not a stored label column; stored: {list(self.categories)}')
+        return self._arrays[column]
+
+    def days(self):
+        """ The mapped date_received, as days since 1970-01-01 (DAY_MISSING = NaT). """
+        return self._arrays[DATE_COLUMN]
+
+    def column(self, column):
+        """A stored column as a Series, like the cleaned frame's.
+
+        Label columns are categoricals over the mapped codes (no copy); date_received is
+        converted to datetime64, which does copy it.
+        """
+        if column == DATE_COLUMN:
+            days = self.days()
+            dates = days.astype('datetime64[D]')
+            dates[days == DAY_MISSING] = np.datetime64('NaT')
+            return pd.Series(dates.astype('datetime64[ns]'), name=column)
+        values = pd.Categorical.from_codes(self.codes(column), self.categories[column], validate=False)
+        return pd.Series(values, name=column, copy=False)
+
+    def frame(self, columns=None):
+        """ The stored columns (or `columns`) as a DataFrame; see column(). """
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({col: self.column(col) for col in columns}, copy=False)
+
+    def _mask(self, where):
+        """ Boolean mask of the rows matching every filter, or None without filters. """
+        mask = None
+        for col, value in where.items():
+            codes = self.codes(col)
+            labels = self.categories[col]
+            values = value if is_list_like(value) else [value]
+            # keep[code + 1] tells whether a code matches; keep[0] is the missing value
+            keep = np.zeros(len(labels) + 1, dtype=bool)
+            keep[0] = any(pd.isna(v) for v in values)
+            found = labels.get_indexer([v for v in values if not pd.isna(v)])
+            keep[found[found >= 0] + 1] = True
+            matches = keep[codes.astype(np.intp) + 1]
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    def count(self, **where):
+        """ Number of rows matching every filter. """
+        mask = self._mask(where)
+        return len(self) if mask is None else int(mask.sum())
+
+    def value_counts(self, column, **where):
+        """ Equivalent of df.loc[<filters>, column].value_counts(). """
+        codes = self.codes(column)
+        mask = self._mask(where)
+        if mask is not None:
+            codes = codes[mask]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.categories[column]))
+        return _sorted_counts(pd.Series(counts, index=self.categories[column].rename(column)))
+
+    @profiled('count_cube')
+    def count_cube(self):
+        """ count_cube() of the stored rows: counts per (product, sub_product, issue, sub_issue). """
+        shape = [len(self.categories[col]) + 1 for col in CUBE_COLS]
+        keys = np.ravel_multi_index([self.codes(col).astype(np.intp) + 1 for col in CUBE_COLS], shape)
+        counts = pd.Series(keys).value_counts(sort=False).sort_index()
+        codes = np.unravel_index(counts.index.to_numpy(), shape)
+        index = pd.MultiIndex(levels=[self.categories[col] for col in CUBE_COLS],
+                              codes=[level_codes - 1 for level_codes in codes], names=CUBE_COLS)
+        return pd.Series(counts.to_numpy(), index=index)
+
+    def cube(self):
+        """ ComplaintCube of the stored rows, for the report tables and breakdowns. """
+        return ComplaintCube(self.count_cube())
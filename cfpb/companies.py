@@ -0,0 +1,91 @@
+""" Company leaderboards, response types and dispute rates.
+
+CompanyStats groups the frame once by (product, issue, company, company_response_to_consumer),
+counting complaints and 'disputed' answers. Every leaderboard is a re-aggregation of that
+table, cached per (product, issue) filter, and top-k selection uses a partial sort
+(numpy.argpartition) rather than sorting thousands of companies.
+
+Dispute rates are taken over complaints with a Yes/No 'disputed' answer only: the CFPB
+stopped asking consumers in 2017, so later complaints have no answer.
+"""
+
+import numpy as np
+import pandas as pd
+
+from cfpb.profiling import profiled
+
+GROUP_COLS = ['product', 'issue', 'company', 'company_response_to_consumer']
+
+
+def _top_k(counts, k):
+    """ Positions of the k largest values, largest first (ties by position). """
+    values = counts.to_numpy()
+    if k < len(values):
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.lexsort((candidates, -values[candidates]))]
+
+
+class CompanyStats:
+    """Complaint and dispute counts per (product, issue, company, response type).
+
+    Arguments:
+        table (pandas.DataFrame): Indexed by GROUP_COLS with 'complaints', 'disputed' and
+            'dispute_answers' columns, as built by from_frame().
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._totals = {}
+
+    @classmethod
+    @profiled('company_stats')
+    def from_frame(cls, df):
+        disputed = df['disputed'].astype('boolean')
+        grouped = pd.DataFrame({
+            'complaints': 1,
+            'disputed': disputed.fillna(False).astype('int64'),
+            'dispute_answers': disputed.notna().astype('int64'),
+        }, index=df.index).groupby([df[col] for col in GROUP_COLS], observed=True, dropna=False).sum()
+        return cls(grouped)
+
+    def _filtered(self, product=None, issue=None):
+        table = self.table
+        if product is not None:
+            table = table[table.index.get_level_values('product') == product]
+        if issue is not None:
+            table = table[table.index.get_level_values('issue') == issue]
+        return table
+
+    def company_totals(self, product=None, issue=None):
+        """ Complaints, disputes and dispute rate per company, optionally within one product and/or issue. """
+        key = (product, issue)
+        if key not in self._totals:
+            totals = self._filtered(product, issue).groupby(level='company', observed=True).sum()
+            totals = totals[totals['complaints'] > 0]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                totals['dispute_rate'] = totals['disputed'] / totals['dispute_answers'].where(
+                    totals['dispute_answers'] > 0)
+            self._totals[key] = totals
+        return self._totals[key]
+
+    def top_companies(self, k=10, product=None, issue=None):
+        """ The k companies with the most complaints, optionally within one product and/or issue. """
+        totals = self.company_totals(product, issue)
+        return totals.iloc[_top_k(totals['complaints'], k)]
+
+    def top_companies_by_product(self, k=5):
+        """ top_companies() for every product, stacked with a (product, company) index. """
+        products = self.table.index.get_level_values('product').unique().dropna()
+        return pd.concat({product: self.top_companies(k, product=product) for product in products},
+                         names=['product', 'company'])
+
+    def responses(self, company=None, product=None):
+        """ Share of each company_response_to_consumer type, for one company and/or product or overall. """
+        table = self._filtered(product)
+        if company is not None:
+            table = table[table.index.get_level_values('company') == company]
+        counts = table['complaints'].groupby(level='company_response_to_consumer', observed=True).sum()
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        return (counts / counts.sum()).rename('share')
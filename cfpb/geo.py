@@ -0,0 +1,143 @@
+""" State and ZIP3 aggregation of complaints, for mapping complaints by state.
+
+States and ZIP codes are normalized against reference tables bundled in cfpb/data (USPS state
+codes and the state each 3-digit ZIP prefix belongs to), so nothing is fetched at run time.
+The CFPB masks the last digits of many ZIP codes ('100XX'); only the 3-digit prefix ('zip3')
+is kept, which survives the masking. Normalization works on the distinct values of the
+categorical columns only.
+
+GeoIndex counts complaints per state x product and zip3 x product once; map and drill-down
+queries read those small matrices instead of scanning the frame.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from cfpb.profiling import profiled
+from cfpb.schema import codes_and_uniques
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+_ZIP3 = re.compile(r'^(\d{3})[\dX]{2}(-\d{4})?$')
+
+
+def states():
+    """ Reference table of USPS state, territory and military codes, indexed by code. """
+    return pd.read_csv(os.path.join(DATA_DIR, 'states.csv'), index_col='code', keep_default_na=False)
+
+
+def zip3_states():
+    """ Series mapping every known 3-digit ZIP prefix ('021') to its state code. """
+    ranges = pd.read_csv(os.path.join(DATA_DIR, 'zip3.csv'), dtype=str)
+    prefixes = {f'{prefix:03d}': row.state
+                for row in ranges.itertuples()
+                for prefix in range(int(row.first), int(row.last) + 1)}
+    return pd.Series(prefixes, name='state').rename_axis('zip3')
+
+
+def normalize_zip3(value):
+    """ 3-digit prefix of a CFPB zip code ('02134', '021XX', '2134' read as a number), or None. """
+    if not isinstance(value, str):
+        if value is None or pd.isna(value):
+            return None
+        value = str(int(value))
+    value = value.strip().upper()
+    if value.isdigit() and len(value) == 4:
+        value = '0' + value  # leading zero lost somewhere upstream
+    match = _ZIP3.match(value)
+    return match.group(1) if match else None
+
+
+def _map_categories(column, func, categories=None):
+    """Apply func to each distinct value of column and broadcast back through its codes
+    (see cfpb.schema.codes_and_uniques()).
+
+    Results outside `categories` (by default, every non-None result) become NaN.
+    """
+    codes, uniques = codes_and_uniques(column)
+    mapped = pd.Index([func(value) for value in uniques], dtype=object)
+    if categories is None:
+        # Several values can map to the same result ('10001', '100XX' -> '100')
+        categories = pd.Index(sorted(set(value for value in mapped if value is not None)), dtype=object)
+    lookup = np.append(categories.get_indexer(mapped), -1)  # code -1 (missing) stays missing
+    return pd.Categorical.from_codes(lookup[codes], categories=categories)
+
+
+def _normalize_state(value):
+    return value.strip().upper() if isinstance(value, str) else None
+
+
+def normalize_geography(df):
+    """Add 'zip3' and replace 'state' with its normalized code, in place.
+
+    States are upper-cased and stripped; codes missing from the reference table become NaN.
+    A missing state is filled in from the ZIP prefix when that prefix is known.
+    """
+    state_codes = pd.Index(states().index)
+    df['zip3'] = _map_categories(df['zip'], normalize_zip3)
+    state = _map_categories(df['state'], _normalize_state, state_codes)
+    from_zip = _map_categories(df['zip3'], zip3_states().get, state_codes)
+    codes = np.where(state.codes >= 0, state.codes, from_zip.codes)
+    df['state'] = pd.Categorical.from_codes(codes, categories=state_codes)
+    return df
+
+
+class GeoIndex:
+    """Complaint counts per state x product and zip3 x product.
+
+    Arguments:
+        products (pandas.Index): Column labels of both matrices.
+        state_counts (pandas.DataFrame): States x products.
+        zip3_counts (pandas.DataFrame): ZIP prefixes x products.
+    """
+
+    def __init__(self, products, state_counts, zip3_counts):
+        self.products = products
+        self.state_counts = state_counts
+        self.zip3_counts = zip3_counts
+
+    @classmethod
+    @profiled('geo_index')
+    def from_frame(cls, df, column='product'):
+        """ Build the index from a cleaned frame (normalizing a copy of its geography first). """
+        if 'zip3' not in df.columns:
+            df = normalize_geography(df[['state', 'zip', column]].copy())
+        products = df[column].astype('category').cat
+        return cls(products.categories, _count_matrix(df['state'], products, 'state'),
+                   _count_matrix(df['zip3'], products, 'zip3'))
+
+    def by_state(self, product=None):
+        """ Complaints per state, for one product or all of them (the choropleth values). """
+        counts = self.state_counts.sum(axis=1) if product is None else self.state_counts[product]
+        return counts.rename('count')
+
+    def by_zip3(self, product=None):
+        """ Complaints per 3-digit ZIP prefix, for one product or all of them. """
+        counts = self.zip3_counts.sum(axis=1) if product is None else self.zip3_counts[product]
+        return counts.rename('count')
+
+    def products_in_state(self, state):
+        """ Products by number of complaints within one state. """
+        counts = self.state_counts.loc[state]
+        return counts[counts > 0].sort_values(ascending=False, kind='stable').rename('count')
+
+    def top_product_by_state(self):
+        """ Most complained about product in each state. """
+        return self.state_counts.idxmax(axis=1)[self.state_counts.sum(axis=1) > 0].rename('product')
+
+
+def _count_matrix(regions, products, name):
+    """ Dense (region x product) counts from one bincount over the category codes. """
+    regions = regions.astype('category').cat
+    n_products = len(products.categories)
+    region_codes = regions.codes.to_numpy().astype(np.int64)
+    product_codes = products.codes.to_numpy().astype(np.int64)
+    keep = (region_codes >= 0) & (product_codes >= 0)
+    keys = region_codes[keep] * n_products + product_codes[keep]
+    counts = np.bincount(keys, minlength=len(regions.categories) * n_products)
+    return pd.DataFrame(counts.reshape(len(regions.categories), n_products),
+                        index=pd.Index(regions.categories, name=name),
+                        columns=products.categories)
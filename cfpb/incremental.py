@@ -0,0 +1,149 @@
+""" Incremental ingestion of daily CFPB exports.
+
+Each export is a full snapshot of the database, but nearly all of it was already seen
+the day before. refresh() keeps a cleaned copy of the data in a store directory, keyed on
+'Complaint ID', together with a hash of every raw row, the complaint count cube and the
+approximate sketches of cfpb.sketch. On the next export only the rows whose ID is new or whose
+raw values changed are cleaned, merged into the store and folded into the counts and sketches,
+so the cleaning and aggregation cost scales with the delta rather than with the full history.
+The kept columns still have to be parsed to find the delta, which is the cheap part.
+
+Complaints that disappear from an export are kept in the store.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cfpb.aggregate import CUBE_COLS, ComplaintCube, count_cube, merge_counts
+from cfpb.cache import atomic_write, write_json, rules_version
+from cfpb.clean import clean_complaints
+from cfpb.load import CHUNKSIZE, COLUMN_NAMES, iter_complaints
+from cfpb.schema import STRING_COLS, apply_schema, codes_and_uniques, concat_frames
+from cfpb.sketch import ComplaintSketches
+
+STORE_DIR = '.cfpb_store'
+
+ID_COLUMN = 'complaint_id'
+INCREMENTAL_COLUMNS = dict(COLUMN_NAMES, **{'Complaint ID': ID_COLUMN})
+
+
+def _store_paths(store_dir):
+    return {name: os.path.join(store_dir, filename) for name, filename in
+            [('complaints', 'complaints.parquet'), ('hashes', 'row_hashes.parquet'),
+             ('counts', 'counts.parquet'), ('sketches', 'sketches'), ('state', 'state.json')]}
+
+
+def _row_hashes(chunk):
+    """ Hash of each raw row's kept values, used to spot complaints that changed since the last export. """
+    values = chunk[list(COLUMN_NAMES.values())]
+    # Same hashes as the strings, but each distinct zip code is hashed once
+    values = values.assign(**{col: pd.Categorical.from_codes(*codes_and_uniques(values[col])) for col in STRING_COLS})
+    return pd.Series(pd.util.hash_pandas_object(values, index=False).to_numpy(), index=chunk[ID_COLUMN].to_numpy())
+
+
+def read_state(store_dir=STORE_DIR):
+    """ High-water mark and bookkeeping of the last refresh, or None for an empty store. """
+    try:
+        with open(_store_paths(store_dir)['state']) as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def load_store(store_dir=STORE_DIR):
+    """ The stored cleaned complaints, with their 'complaint_id'. """
+    return apply_schema(pd.read_parquet(_store_paths(store_dir)['complaints']))
+
+
+def load_store_cube(store_dir=STORE_DIR):
+    """ ComplaintCube over the stored complaints, without touching the complaint rows. """
+    counts = pd.read_parquet(_store_paths(store_dir)['counts'])
+    return ComplaintCube(counts.set_index(CUBE_COLS)['count'])
+
+
+def load_store_sketches(store_dir=STORE_DIR):
+    """ ComplaintSketches of the stored complaints, for approximate queries. """
+    return ComplaintSketches.load(_store_paths(store_dir)['sketches'])
+
+
+def _refresh_sketches(path, stored, delta, incremental):
+    """ The stored sketches plus those of `delta`, or sketches of all of `stored` when they can't be merged. """
+    if incremental:
+        try:
+            return ComplaintSketches.load(path).merge(ComplaintSketches.from_frame(delta))
+        except (OSError, ValueError):
+            pass
+    # Sketches can't forget the old labels of changed complaints, so those force a rebuild
+    return ComplaintSketches.from_frame(stored)
+
+
+def refresh(path='Consumer_Complaints.csv', store_dir=STORE_DIR, chunksize=CHUNKSIZE):
+    """Bring the store in line with the export at `path`, cleaning only new and changed rows.
+
+    The first run, and any run after the cleaning rules changed (cfpb.cache.rules_version),
+    rebuilds the store from scratch.
+
+    Returns:
+        dict: 'new' and 'changed' row counts, total 'rows' in the store and the new 'high_water_mark'.
+    """
+    paths = _store_paths(store_dir)
+    state = read_state(store_dir)
+    if state is not None and state.get('rules_version') != rules_version():
+        state = None
+
+    if state is None:
+        stored, hashes = None, pd.Series([], dtype='uint64')
+        counts = merge_counts([])
+        high_water_mark = -1
+    else:
+        stored = load_store(store_dir)
+        hashes = pd.read_parquet(paths['hashes']).set_index(ID_COLUMN)['row_hash']
+        counts = load_store_cube(store_dir).counts
+        high_water_mark = state['high_water_mark']
+
+    delta, delta_hashes, n_new = [], [], 0
+    for chunk in iter_complaints(path, chunksize, columns=INCREMENTAL_COLUMNS):
+        chunk_hashes = _row_hashes(chunk)
+        ids = chunk[ID_COLUMN].to_numpy()
+        # IDs above the high-water mark are new by construction; below it, compare row hashes
+        positions = hashes.index.get_indexer(ids)
+        is_new = (ids > high_water_mark) | (positions < 0)
+        if len(hashes):
+            is_changed = ~is_new & (hashes.to_numpy()[positions] != chunk_hashes.to_numpy())
+        else:
+            is_changed = np.zeros(len(ids), dtype=bool)
+        keep = is_new | is_changed
+        n_new += int(is_new.sum())
+        if keep.any():
+            delta.append(chunk[keep])
+            delta_hashes.append(chunk_hashes[keep])
+
+    if not delta:
+        return {'new': 0, 'changed': 0, 'rows': 0 if stored is None else len(stored),
+                'high_water_mark': high_water_mark}
+
+    delta = clean_complaints(concat_frames(delta))
+    delta_ids = delta[ID_COLUMN]
+    removed = [] if stored is None else [count_cube(stored[stored[ID_COLUMN].isin(delta_ids)])]
+    counts = merge_counts([counts] + [-part for part in removed] + [count_cube(delta)])
+    if stored is not None:
+        stored = concat_frames([stored[~stored[ID_COLUMN].isin(delta_ids)], delta])
+    else:
+        stored = delta
+    sketches = _refresh_sketches(paths['sketches'], stored, delta, state is not None and len(delta) == n_new)
+    hashes = pd.concat([hashes.drop(delta_ids, errors='ignore')] + delta_hashes)
+    high_water_mark = max(high_water_mark, int(delta_ids.max()))
+
+    os.makedirs(store_dir, exist_ok=True)
+    atomic_write(paths['complaints'], lambda tmp: stored.to_parquet(tmp, index=False))
+    atomic_write(paths['hashes'], lambda tmp: hashes.rename('row_hash').rename_axis(ID_COLUMN)
+                  .reset_index().to_parquet(tmp, index=False))
+    atomic_write(paths['counts'], lambda tmp: counts.rename('count').reset_index().to_parquet(tmp, index=False))
+    sketches.save(paths['sketches'])
+    state = {'high_water_mark': high_water_mark, 'rows': len(stored), 'rules_version': rules_version()}
+    atomic_write(paths['state'], lambda tmp: write_json(state, tmp))
+
+    return {'new': n_new, 'changed': len(delta) - n_new, 'rows': len(stored), 'high_water_mark': high_water_mark}
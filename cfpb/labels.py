@@ -0,0 +1,104 @@
+""" Canonical labels for product, sub_product, issue and sub_issue.
+
+LABEL_MAP lists, per column, raw labels and the canonical label they stand for. Matching is
+exact after folding case and whitespace, so 'Consumer Loan' and 'Consumer  loan ' hit the same
+entry, but a label that merely contains a mapped phrase is left alone (str.replace would
+rewrite the substring). Every label also has its whitespace collapsed.
+
+The work is done once per distinct label: each category of the column is resolved through a
+cache and the category codes are remapped, so the rows themselves are never compared.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from cfpb.profiling import profiled
+
+LABEL_COLS = ['product', 'sub_product', 'issue', 'sub_issue']
+
+LABEL_MAP = {
+    'product': {
+        'Consumer Loan': 'Consumer loan',
+    },
+    'sub_product': {
+        # Consolidated into 'Other debt' within the 'Debt collection' product (Clean Data (B))
+        'I do not know': 'Other debt',
+        'Other (i.e. phone, health club, etc.)': 'Other debt',
+    },
+    'issue': {
+        # Issue name used before the CFPB's 2017 revision of the complaint form
+        'Incorrect information on credit report': 'Incorrect information on your report',
+    },
+}
+
+
+def fold(label):
+    """ Matching key for a label: whitespace collapsed and case folded. """
+    return ' '.join(label.split()).casefold()
+
+
+class LabelNormalizer:
+    """Resolve raw labels to canonical ones through a folded LABEL_MAP and a per-label cache.
+
+    Arguments:
+        mapping (dict): column -> {raw label: canonical label}, like LABEL_MAP.
+    """
+
+    def __init__(self, mapping=LABEL_MAP):
+        self.mapping = {column: {fold(raw): canonical for raw, canonical in labels.items()}
+                        for column, labels in mapping.items()}
+        self._cache = {}
+
+    def canonical(self, column, label):
+        key = (column, label)
+        if key not in self._cache:
+            folded = fold(label)
+            self._cache[key] = self.mapping.get(column, {}).get(folded, ' '.join(label.split()))
+        return self._cache[key]
+
+    def normalize(self, df, columns=LABEL_COLS):
+        """Replace the labels of `columns` with their canonical form, in place.
+
+        Returns:
+            pandas.DataFrame: One row per changed label with the number of rows it covered.
+        """
+        changes = []
+        for column in columns:
+            if column not in df.columns:
+                continue
+            values = df[column].astype('category').cat
+            labels = values.categories
+            new_labels = pd.Index([self.canonical(column, label) for label in labels], dtype=object)
+            categories = pd.Index(sorted(set(new_labels)), dtype=object)
+            lookup = np.append(categories.get_indexer(new_labels), -1)  # code -1 (missing) stays missing
+            codes = values.codes.to_numpy()
+            df[column] = pd.Categorical.from_codes(lookup[codes], categories=categories)
+
+            changed = np.flatnonzero(new_labels != labels)
+            if len(changed):
+                rows = np.bincount(codes[codes >= 0], minlength=len(labels))
+                changes += [(column, labels[i], new_labels[i], rows[i]) for i in changed]
+            _warn_case_variants(column, categories)
+        return pd.DataFrame(changes, columns=['column', 'label', 'new_label', 'rows'])
+
+
+def _warn_case_variants(column, labels):
+    """ Case/whitespace variants that LABEL_MAP doesn't resolve yet are reported, not guessed at. """
+    seen = {}
+    for label in labels:
+        seen.setdefault(fold(label), []).append(label)
+    variants = [group for group in seen.values() if len(group) > 1]
+    if variants:
+        warnings.warn(f'{column} has labels differing only in case, add them to cfpb.labels.LABEL_MAP: {variants}')
+
+
+_default_normalizer = LabelNormalizer()
+
+
+@profiled('normalize_labels', modified=lambda changes: changes['rows'].sum(),
+          details=lambda changes: changes.groupby('column')['rows'].sum().astype(int).to_dict())
+def normalize_labels(df, columns=LABEL_COLS):
+    """ LabelNormalizer.normalize() with LABEL_MAP, sharing one label cache across calls. """
+    return _default_normalizer.normalize(df, columns)
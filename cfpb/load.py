@@ -0,0 +1,129 @@
+""" Streaming loader for Consumer_Complaints.csv.
+
+Only the columns the analysis keeps are parsed, so the 'Consumer complaint narrative'
+text (by far the largest column) is never materialized, and the file is read in fixed-size
+chunks so peak memory is bounded by the chunk size rather than by the size of the export.
+
+An export can also be given as several files, a glob pattern, or compressed: .csv.gz (or
+.bz2/.xz) files and the CSV members of .zip archives are decompressed as they are parsed,
+never to disk.
+"""
+
+import contextlib
+import os
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+import pandas as pd
+
+from cfpb.profiling import profiled
+from cfpb.schema import apply_schema, concat_frames, read_dtypes
+
+# Columns dropped in Clean Data (A). Kept here for reference; the loader never reads them.
+UNNECESSARY_COLS = ['Consumer complaint narrative', 'Company public response', 'Tags',
+                    'Consumer consent provided?', 'Submitted via', 'Date sent to company',
+                    'Timely response?', 'Complaint ID']
+
+# Raw CSV header -> short column name used throughout the analysis.
+COLUMN_NAMES = {'Date received': 'date_received', 'Product': 'product',
+                'Sub-product': 'sub_product', 'Issue': 'issue',
+                'Sub-issue': 'sub_issue', 'Company': 'company',
+                'State': 'state', 'Zip code': 'zip',
+                'Company response to consumer': 'company_response_to_consumer',
+                'Consumer disputed?': 'disputed'}
+
+CHUNKSIZE = 250_000
+
+
+class Source(namedtuple('Source', ['path', 'member'])):
+    """ One CSV of an export: a (possibly compressed) file, or the CSV `member` of a .zip archive. """
+
+
+def complaint_sources(path):
+    """Expand `path` into the CSV sources it names, in order.
+
+    Arguments:
+        path (str or list): A file, a glob pattern ('exports/*.csv.gz') or a list of either.
+            Every CSV in a .zip archive is a separate source.
+    """
+    paths = [path] if isinstance(path, (str, os.PathLike, Source)) else path
+    sources = []
+    for path in paths:
+        if isinstance(path, Source):
+            sources.append(path)
+            continue
+        path = os.fspath(path)
+        matches = sorted(glob(path)) if any(char in path for char in '*?[') else [path]
+        if not matches:
+            raise FileNotFoundError(f'no files match {path!r}')
+        for match in matches:
+            if match.lower().endswith('.zip'):
+                with zipfile.ZipFile(match) as archive:
+                    members = sorted(name for name in archive.namelist() if name.lower().endswith('.csv'))
+                sources += [Source(match, member) for member in members]
+            else:
+                sources.append(Source(match, None))
+    return sources
+
+
+@contextlib.contextmanager
+def open_source(source):
+    """ `source` as read_csv input: its path (read_csv decompresses .gz/.bz2/.xz itself) or a .zip member stream. """
+    if source.member is None:
+        yield source.path
+        return
+    with zipfile.ZipFile(source.path) as archive, archive.open(source.member) as f:
+        yield f
+
+
+def iter_complaints(path='Consumer_Complaints.csv', chunksize=CHUNKSIZE, columns=COLUMN_NAMES):
+    """Yield the complaints file as renamed DataFrame chunks in the compact schema (see cfpb.schema).
+
+    Arguments:
+        path (str or list): CSV export from the Consumer Complaint Database, or several
+            (possibly compressed) files; see complaint_sources().
+        chunksize (int): Number of rows parsed per chunk.
+        columns (dict): Raw header -> new name for every column to keep. All other
+            columns are skipped by the parser.
+    """
+    for source in complaint_sources(path):
+        with open_source(source) as f:
+            reader = pd.read_csv(f, usecols=list(columns), dtype=read_dtypes(columns), chunksize=chunksize)
+            for chunk in reader:
+                yield apply_schema(chunk.rename(columns=columns))
+
+
+def _empty_frame():
+    return apply_schema(pd.DataFrame(columns=list(COLUMN_NAMES.values())))
+
+
+def _load_source(source, chunksize=CHUNKSIZE):
+    chunks = list(iter_complaints(source, chunksize))
+    return concat_frames(chunks) if chunks else _empty_frame()
+
+
+@profiled('load_complaints')
+def load_complaints(path='Consumer_Complaints.csv', chunksize=CHUNKSIZE, workers=None):
+    """Read the complaints file with unnecessary columns dropped and columns renamed.
+
+    Equivalent to read_csv -> drop(UNNECESSARY_COLS) -> rename(COLUMN_NAMES), without
+    ever holding the dropped columns in memory. Label columns come back as 'category' and
+    'disputed' as a nullable boolean.
+
+    Arguments:
+        path (str or list): Export file(s); see complaint_sources().
+        chunksize (int): Number of rows parsed per chunk.
+        workers (int): With several sources, decompress and parse up to this many of them at
+            once in worker processes. The result is the same as reading them one by one.
+    """
+    sources = complaint_sources(path)
+    if workers is not None and workers > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_load_source, sources, [chunksize] * len(sources)))
+    else:
+        frames = list(iter_complaints(sources, chunksize))
+    if not frames:
+        return _empty_frame()
+    return concat_frames(frames)
@@ -0,0 +1,342 @@
+""" Opt-in full-text index of the 'Consumer complaint narrative' column.
+
+The main loader never reads the narratives. build_narrative_index() streams only the narrative,
+'Complaint ID' and the product/sub_product/issue labels (cleaned as in clean_complaints, for the
+per-product statistics) and writes an index directory:
+
+    docs.bin, docs.npy                narrative text (UTF-8) and the byte offset of each doc
+    doc_ids.npy, doc_labels.npy       complaint ID and (product, issue) codes of each doc
+    postings.npy, freqs.npy           doc numbers and term frequencies, grouped by term
+    positions.npy                     token positions of each (term, doc) posting, in posting order
+    term_offsets.npy, position_offsets.npy, terms.json
+                                      term -> slice of postings/freqs and of positions
+    labels.json, *_terms.npy          label dictionaries and (term, label code, count) triples
+
+Memory while indexing is one chunk of text plus the vocabulary and the sparse term x label
+counts: each chunk's postings are spilled to run files, and the runs are scattered into place
+through memmaps at the end. NarrativeIndex opens the files memory-mapped. Keywords are
+answered by intersecting postings, quoted phrases by lining up the token positions of the
+docs that contain all of their words; the text itself is only read to display a narrative.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from cfpb.cache import atomic_replace_dir
+from cfpb.labels import normalize_labels
+from cfpb.load import complaint_sources, open_source
+from cfpb.profiling import profiled
+from cfpb.recategorize import recategorize_products
+
+NARRATIVE_DIR = '.cfpb_narratives'
+
+NARRATIVE_COLUMNS = {'Complaint ID': 'complaint_id', 'Consumer complaint narrative': 'narrative',
+                     'Product': 'product', 'Sub-product': 'sub_product', 'Issue': 'issue'}
+LABELS = ['product', 'issue']
+
+# Rows per chunk. Tokenizing holds every token of a chunk as a Python string, so chunks are
+# smaller than the loader's.
+NARRATIVE_CHUNKSIZE = 50_000
+
+TOKEN = re.compile(r'[a-z0-9]+')
+
+# Left out of top_terms() only; every token is searchable. 'xxxx' is the CFPB's redaction mark.
+STOPWORDS = frozenset('''
+    a about after again all also am an and any are as at be been before being but by can could
+    did do does doing for from had has have having he her him his how i if in into is it its me
+    my no not of on or our out over she so some than that the their them then there these they
+    this those to too under until up us very was we were what when which who why will with would
+    you your x xx xxx xxxx xxxxxxxx 00 '''.split())
+
+
+def tokenize(text):
+    """ Lower-cased alphanumeric tokens of `text`, as they are indexed. """
+    return TOKEN.findall(text.lower())
+
+
+def _label_codes(column, codes):
+    """ Global codes for a chunk's categorical column, adding its new labels to `codes`. """
+    lookup = np.array([codes.setdefault(label, len(codes)) for label in column.cat.categories] + [-1])
+    return lookup[column.cat.codes.to_numpy()]
+
+
+def _grow(counts, n):
+    return np.pad(counts, (0, n - len(counts)))
+
+
+def _add_counts(table, terms, labels, freqs):
+    """ Fold (term, label) -> count pairs into `table`, skipping docs without a label. """
+    has_label = labels >= 0
+    chunk = pd.Series(freqs[has_label], index=pd.MultiIndex.from_arrays([terms[has_label], labels[has_label]]))
+    return pd.concat([table, chunk]).groupby(level=[0, 1]).sum()
+
+
+def _iter_narratives(path, chunksize):
+    dtype = {raw: 'category' for raw, new in NARRATIVE_COLUMNS.items() if new in ('product', 'sub_product', 'issue')}
+    for source in complaint_sources(path):
+        with open_source(source) as f:
+            yield from pd.read_csv(f, usecols=list(NARRATIVE_COLUMNS), chunksize=chunksize, dtype=dtype)
+
+
+@profiled('narrative_index', details=lambda index: {'docs': len(index), 'terms': len(index.terms)})
+def build_narrative_index(path='Consumer_Complaints.csv', index_dir=NARRATIVE_DIR, chunksize=NARRATIVE_CHUNKSIZE):
+    """Index the narratives of the export at `path` into `index_dir`, replacing any previous index.
+
+    `path` may also name several (possibly compressed) files; see cfpb.load.complaint_sources().
+
+    Returns:
+        NarrativeIndex: The new index.
+    """
+    atomic_replace_dir(index_dir, lambda tmp_dir: _write_index(path, tmp_dir, chunksize))
+    return NarrativeIndex(index_dir)
+
+
+def _write_index(path, tmp_dir, chunksize):
+    """ Write the index files of build_narrative_index() into the empty directory `tmp_dir`. """
+    vocab = {}
+    label_codes = {col: {} for col in LABELS}
+    label_terms = {col: pd.Series([], dtype='int64', index=pd.MultiIndex.from_arrays([[], []])) for col in LABELS}
+    term_docs = term_tokens = np.zeros(0, dtype=np.int64)
+    doc_offsets, doc_ids, doc_labels, runs = [np.zeros(1, dtype=np.int64)], [], [], []
+    n_docs = n_bytes = 0
+
+    with open(os.path.join(tmp_dir, 'docs.bin'), 'wb') as docs:
+        for chunk in _iter_narratives(path, chunksize):
+            chunk = chunk.rename(columns=NARRATIVE_COLUMNS).dropna(subset=['narrative']).reset_index(drop=True)
+            if chunk.empty:
+                continue
+            normalize_labels(chunk, ['product', 'sub_product', 'issue'])
+            recategorize_products(chunk)
+
+            text = chunk['narrative'].str.encode('utf-8')
+            docs.write(b''.join(text))
+            doc_offsets.append(n_bytes + np.cumsum(text.str.len().to_numpy(), dtype=np.int64))
+            n_bytes = int(doc_offsets[-1][-1])
+            doc_ids.append(chunk['complaint_id'].to_numpy(np.int64))
+            labels = np.column_stack([_label_codes(chunk[col], label_codes[col]) for col in LABELS])
+            doc_labels.append(labels.astype(np.int32))
+
+            tokens = chunk['narrative'].str.lower().str.findall(TOKEN).explode().dropna()
+            local_docs = tokens.index.to_numpy()
+            positions = np.arange(len(tokens)) - np.searchsorted(local_docs, local_docs)
+            local_terms, uniques = pd.factorize(tokens.to_numpy())
+            term_ids = np.array([vocab.setdefault(token, len(vocab)) for token in uniques], dtype=np.int64)
+            # Sort the tokens by (term, doc), keeping each doc's positions in order
+            keys = term_ids[local_terms] * len(chunk) + local_docs
+            order = np.argsort(keys, kind='stable')
+            keys, positions = keys[order], positions[order]
+            starts = np.flatnonzero(np.diff(keys, prepend=-1))
+            freqs = np.diff(starts, append=len(keys))
+            terms, local_docs = np.divmod(keys[starts], len(chunk))
+
+            run = os.path.join(tmp_dir, f'run{len(runs)}')
+            np.save(f'{run}.npy', np.column_stack([terms, local_docs + n_docs, freqs]))
+            np.save(f'{run}.positions.npy', positions.astype(np.int32))
+            runs.append(run)
+            term_docs = _grow(term_docs, len(vocab)) + np.bincount(terms, minlength=len(vocab))
+            term_tokens = _grow(term_tokens, len(vocab)) + np.bincount(terms, weights=freqs,
+                                                                       minlength=len(vocab)).astype(np.int64)
+            for i, col in enumerate(LABELS):
+                label_terms[col] = _add_counts(label_terms[col], terms, labels[local_docs, i], freqs)
+            n_docs += len(chunk)
+
+    _merge_runs(tmp_dir, runs, term_docs, term_tokens)
+    np.save(os.path.join(tmp_dir, 'docs.npy'), np.concatenate(doc_offsets))
+    np.save(os.path.join(tmp_dir, 'doc_ids.npy'), np.concatenate(doc_ids) if doc_ids else np.zeros(0, np.int64))
+    np.save(os.path.join(tmp_dir, 'doc_labels.npy'),
+            np.concatenate(doc_labels) if doc_labels else np.zeros((0, len(LABELS)), np.int32))
+    for col, counts in label_terms.items():
+        triples = np.column_stack([counts.index.get_level_values(0), counts.index.get_level_values(1), counts])
+        np.save(os.path.join(tmp_dir, f'{col}_terms.npy'), triples.astype(np.int64).reshape(-1, 3))
+    with open(os.path.join(tmp_dir, 'terms.json'), 'w') as f:
+        json.dump(list(vocab), f)
+    with open(os.path.join(tmp_dir, 'labels.json'), 'w') as f:
+        json.dump({col: list(codes) for col, codes in label_codes.items()}, f)
+
+
+def _merge_runs(index_dir, runs, term_docs, term_tokens):
+    """Scatter the per-chunk runs into term-grouped arrays, one run in memory at a time.
+
+    term_docs and term_tokens are the number of docs and of occurrences of each term over all runs.
+    """
+    def offsets(counts):
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets
+
+    def output(name, size):
+        return np.lib.format.open_memmap(os.path.join(index_dir, name), 'w+', np.int32, (size,))
+
+    term_offsets, position_offsets = offsets(term_docs), offsets(term_tokens)
+    np.save(os.path.join(index_dir, 'term_offsets.npy'), term_offsets)
+    np.save(os.path.join(index_dir, 'position_offsets.npy'), position_offsets)
+    postings = output('postings.npy', term_offsets[-1])
+    freqs = output('freqs.npy', term_offsets[-1])
+    positions = output('positions.npy', position_offsets[-1])
+
+    # Runs cover increasing doc numbers, so appending them in order keeps each term's docs sorted
+    posting_fill, position_fill = term_offsets[:-1].copy(), position_offsets[:-1].copy()
+    for run in runs:
+        entries = np.load(f'{run}.npy')
+        terms, run_freqs = entries[:, 0], entries[:, 2]
+        token_terms = np.repeat(terms, run_freqs)
+        for fill, targets, values, keys in [(posting_fill, [postings, freqs], [entries[:, 1], run_freqs], terms),
+                                            (position_fill, [positions], [np.load(f'{run}.positions.npy')],
+                                             token_terms)]:
+            counts = np.bincount(keys, minlength=len(fill))
+            at = fill[keys] + np.arange(len(keys)) - (np.cumsum(counts) - counts)[keys]
+            for target, value in zip(targets, values):
+                target[at] = value
+            fill += counts
+        os.remove(f'{run}.npy')
+        os.remove(f'{run}.positions.npy')
+    for array in (postings, freqs, positions):
+        array.flush()
+
+
+def _parse_query(query):
+    """ Query string -> list of phrases (token lists). "Quoted text" is a phrase, other words stand alone. """
+    phrases = [tokenize(quoted or word) for quoted, word in re.findall(r'"([^"]*)"|(\S+)', query)]
+    return [phrase for phrase in phrases if phrase]
+
+
+class NarrativeIndex:
+    """Memory-mapped narrative index written by build_narrative_index().
+
+    Arguments:
+        index_dir (str): Index directory.
+    """
+
+    def __init__(self, index_dir=NARRATIVE_DIR):
+        def load(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode='r')
+
+        with open(os.path.join(index_dir, 'terms.json')) as f:
+            self.terms = json.load(f)
+        with open(os.path.join(index_dir, 'labels.json')) as f:
+            self.labels = {col: pd.Index(labels, dtype=object) for col, labels in json.load(f).items()}
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        self._term_offsets = load('term_offsets.npy')
+        self._postings = load('postings.npy')
+        self._freqs = load('freqs.npy')
+        self._position_offsets = load('position_offsets.npy')
+        self._positions = load('positions.npy')
+        self._doc_offsets = load('docs.npy')
+        self.doc_ids = load('doc_ids.npy')
+        self._doc_labels = load('doc_labels.npy')
+        self._label_terms = {col: load(f'{col}_terms.npy') for col in LABELS}
+        docs = os.path.join(index_dir, 'docs.bin')
+        self._text = np.memmap(docs, mode='r') if os.path.getsize(docs) else np.zeros(0, np.uint8)
+        self._doc_order = None
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def text(self, doc):
+        """ Narrative of doc number `doc`. """
+        return bytes(self._text[self._doc_offsets[doc]:self._doc_offsets[doc + 1]]).decode('utf-8')
+
+    def narrative(self, complaint_id):
+        """ Narrative of a complaint, or None if it has none. """
+        if self._doc_order is None:
+            self._doc_order = np.argsort(self.doc_ids, kind='stable')
+        i = np.searchsorted(self.doc_ids, complaint_id, sorter=self._doc_order)
+        if i < len(self) and self.doc_ids[self._doc_order[i]] == complaint_id:
+            return self.text(self._doc_order[i])
+        return None
+
+    def _term(self, term):
+        """ (docs, freqs) of a token, both empty for an unknown token. """
+        i = self._term_ids.get(term)
+        if i is None:
+            return self._postings[:0], self._freqs[:0]
+        start, end = self._term_offsets[i], self._term_offsets[i + 1]
+        return self._postings[start:end], self._freqs[start:end]
+
+    def _label_code(self, column, label):
+        """ Code of `label` in doc_labels, -2 (matching no doc) if it never occurs. """
+        code = self.labels[column].get_indexer([label])[0]
+        return code if code >= 0 else -2
+
+    def _token_positions(self, term, docs):
+        """ (doc, position) of every occurrence of `term` in `docs`, all of which contain it. """
+        i = self._term_ids[term]
+        start, end = self._term_offsets[i], self._term_offsets[i + 1]
+        freqs = np.asarray(self._freqs[start:end], dtype=np.int64)
+        found = np.searchsorted(self._postings[start:end], docs)
+        counts = freqs[found]
+        firsts = self._position_offsets[i] + (np.cumsum(freqs) - freqs)[found]
+        at = np.repeat(firsts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        return np.repeat(docs, counts), self._positions[at]
+
+    def _phrase_docs(self, phrase, docs):
+        """ The docs among `docs` (which contain every token of `phrase`) where the tokens are adjacent. """
+        starts = None
+        for offset, term in enumerate(phrase):
+            term_docs, positions = self._token_positions(term, docs)
+            # (doc, position the phrase would start at), packed into one int64
+            keys = (term_docs.astype(np.int64) << 32) + positions - offset
+            starts = keys if starts is None else np.intersect1d(starts, keys)
+        return np.unique(starts >> 32)
+
+    def search(self, query, product=None, issue=None, limit=None):
+        """Narratives containing every word and "quoted phrase" of `query`.
+
+        Returns:
+            pandas.DataFrame: complaint_id, product, issue and hits (occurrences of the query's
+                tokens) of each match, most hits first.
+        """
+        phrases = _parse_query(query)
+        if not phrases:
+            raise ValueError(f'no searchable terms in {query!r}')
+        postings = sorted((self._term(token) for token in {t for phrase in phrases for t in phrase}),
+                          key=lambda posting: len(posting[0]))
+        docs = np.asarray(postings[0][0])
+        hits = np.asarray(postings[0][1], dtype=np.int64)
+        for other_docs, other_freqs in postings[1:]:
+            i = np.minimum(np.searchsorted(other_docs, docs), max(len(other_docs) - 1, 0))
+            found = other_docs[i] == docs if len(other_docs) else np.zeros(len(docs), dtype=bool)
+            docs, hits = docs[found], hits[found] + other_freqs[i[found]]
+        for j, (col, label) in enumerate(zip(LABELS, [product, issue])):
+            if label is not None:
+                keep = self._doc_labels[docs, j] == self._label_code(col, label)
+                docs, hits = docs[keep], hits[keep]
+
+        for phrase in phrases:
+            if len(phrase) > 1 and len(docs):
+                keep = np.isin(docs, self._phrase_docs(phrase, docs))
+                docs, hits = docs[keep], hits[keep]
+        order = np.lexsort((self.doc_ids[docs], -hits))[:limit]
+        docs, hits = docs[order], hits[order]
+
+        labels = np.asarray(self._doc_labels[docs])
+        result = pd.DataFrame({'complaint_id': self.doc_ids[docs]})
+        for j, col in enumerate(LABELS):
+            result[col] = pd.Categorical.from_codes(labels[:, j], categories=self.labels[col])
+        result['hits'] = hits
+        return result
+
+    def count(self, query, product=None, issue=None):
+        """ Number of narratives matching `query` (see search()). """
+        return len(self.search(query, product, issue))
+
+    def top_terms(self, k=20, product=None, issue=None, stopwords=STOPWORDS):
+        """ The k most frequent terms of the narratives, of one product or of one issue. """
+        if product is not None and issue is not None:
+            raise ValueError('top_terms() takes a product or an issue, not both')
+        if product is None and issue is None:
+            counts = np.diff(self._position_offsets)
+            terms = np.arange(len(counts))
+        else:
+            col, label = ('product', product) if product is not None else ('issue', issue)
+            triples = self._label_terms[col]
+            triples = triples[triples[:, 1] == self._label_code(col, label)]
+            terms, counts = triples[:, 0], triples[:, 2]
+        words = np.array(self.terms, dtype=object)[terms] if len(terms) else np.array([], dtype=object)
+        keep = np.array([word not in stopwords for word in words], dtype=bool)
+        top = pd.Series(np.asarray(counts)[keep], index=pd.Index(words[keep], name='term'), name='count')
+        return top.iloc[np.lexsort((top.index.astype(str), -top.to_numpy()))][:k]
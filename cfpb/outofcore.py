@@ -0,0 +1,36 @@
+""" Out-of-core aggregation for exports that don't fit in memory.
+
+The file is streamed through iter_complaints(); each chunk is cleaned and reduced to its
+complaint count cube, and the cubes are merged as they arrive. Memory is bounded by the chunk
+size plus the cube, which only grows with the number of distinct (product, sub_product,
+issue, sub_issue) combinations. Cleaning is row-local, so the merged cube, and every table
+derived from it, is exactly what the in-memory path produces.
+
+streaming_sketches() builds the approximate sketches of cfpb.sketch the same way.
+"""
+
+from cfpb.aggregate import ComplaintCube, count_cube, merge_counts, summary_tables
+from cfpb.clean import clean_complaints
+from cfpb.load import CHUNKSIZE, iter_complaints
+from cfpb.sketch import ComplaintSketches
+
+
+def streaming_count_cube(path='Consumer_Complaints.csv', chunksize=CHUNKSIZE):
+    """ count_cube() of the cleaned complaints, one chunk at a time. """
+    counts = merge_counts([])
+    for chunk in iter_complaints(path, chunksize):
+        counts = merge_counts([counts, count_cube(clean_complaints(chunk))])
+    return counts
+
+
+def out_of_core_summary(path='Consumer_Complaints.csv', chunksize=CHUNKSIZE):
+    """ summary_tables() for the file at `path` without loading it into memory. """
+    return summary_tables(ComplaintCube(streaming_count_cube(path, chunksize)))
+
+
+def streaming_sketches(path='Consumer_Complaints.csv', chunksize=CHUNKSIZE):
+    """ ComplaintSketches of the cleaned complaints, one chunk at a time. """
+    sketches = ComplaintSketches()
+    for chunk in iter_complaints(path, chunksize):
+        sketches.update(clean_complaints(chunk))
+    return sketches
@@ -0,0 +1,140 @@
+""" Multi-core cleaning over byte-range partitions of the complaints CSV.
+
+The file is cut into partitions of roughly PARTITION_SIZE bytes at row boundaries, and each
+worker process parses and cleans its own partition with the same code as the single-process
+path (iter_complaints' column selection and schema, then clean_complaints). Results come back
+in partition order, so the output doesn't depend on scheduling.
+
+Narratives can contain newlines inside quoted fields, so partition boundaries are only placed
+on newlines outside quotes. Finding them takes one pass counting quote characters, which runs
+at memory speed.
+
+A compressed file or .zip member can't be cut at byte offsets, so each one is a single task;
+an export split over several such files is still decompressed and parsed in parallel.
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from cfpb.aggregate import count_cube, merge_counts
+from cfpb.clean import clean_complaints
+from cfpb.load import COLUMN_NAMES, _empty_frame, _load_source, complaint_sources
+from cfpb.schema import apply_schema, concat_frames, read_dtypes
+from cfpb.sketch import ComplaintSketches, merge_sketches
+
+PARTITION_SIZE = 64 << 20
+SCAN_BLOCK_SIZE = 16 << 20
+
+# Extensions read_csv decompresses (see cfpb.load.open_source)
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz', '.zst')
+
+
+def partition_csv(path, partition_size=PARTITION_SIZE):
+    """Split the CSV at `path` into byte ranges that each hold whole rows.
+
+    Returns:
+        tuple: (header_end, ranges) where bytes [0, header_end) are the header line and
+            ranges is a list of (start, end) byte offsets covering the rest of the file.
+    """
+    size = os.path.getsize(path)
+    boundaries = []
+    target = 0  # next boundary goes at the first row break at or after this offset
+    in_quotes = 0
+    block_start = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            cursor = 0  # in_quotes is known up to block[cursor]
+            while True:
+                start = max(target - block_start, cursor)
+                newline = block.find(b'\n', start) if start < len(block) else -1
+                if newline < 0:
+                    break
+                in_quotes ^= block.count(b'"', cursor, newline) & 1
+                cursor = newline + 1
+                if not in_quotes:
+                    boundaries.append(block_start + cursor)
+                    target = block_start + cursor + partition_size
+            in_quotes ^= block.count(b'"', cursor) & 1
+            block_start += len(block)
+
+    if not boundaries:
+        return size, []
+    header_end = boundaries[0]
+    ends = boundaries[1:] + [size]
+    ranges = [(start, end) for start, end in zip(boundaries, ends) if end > start]
+    return header_end, ranges
+
+
+def read_partition(path, header_end, start, end, columns=COLUMN_NAMES):
+    """ Parse one byte range of the CSV into the same frame iter_complaints() yields. """
+    with open(path, 'rb') as f:
+        header = f.read(header_end)
+        f.seek(start)
+        body = f.read(end - start)
+    chunk = pd.read_csv(io.BytesIO(header + body), usecols=list(columns), dtype=read_dtypes(columns))
+    return apply_schema(chunk.rename(columns=columns))
+
+
+def _read_task(task):
+    """ A byte range (path, header_end, start, end) of a plain CSV, or a whole (Source,). """
+    return read_partition(*task) if len(task) == 4 else _load_source(task[0])
+
+
+def _clean_partition(task):
+    return clean_complaints(_read_task(task))
+
+
+def _count_partition(task):
+    return count_cube(_clean_partition(task))
+
+
+def _sketch_partition(task):
+    return ComplaintSketches.from_frame(_clean_partition(task))
+
+
+def _map_partitions(func, path, workers, partition_size):
+    tasks = []
+    for source in complaint_sources(path):
+        if source.member is not None or source.path.lower().endswith(COMPRESSED_EXTENSIONS):
+            tasks.append((source,))
+        else:
+            header_end, ranges = partition_csv(source.path, partition_size)
+            tasks += [(source.path, header_end, start, end) for start, end in ranges]
+    if not tasks:
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, so results don't depend on which worker finishes first
+        return list(pool.map(func, tasks))
+
+
+def parallel_clean_complaints(path='Consumer_Complaints.csv', workers=None, partition_size=PARTITION_SIZE):
+    """Load and clean the complaints file in a process pool.
+
+    Equivalent to clean_complaints(load_complaints(path)).
+
+    Arguments:
+        path (str or list): CSV export from the Consumer Complaint Database, or several
+            (possibly compressed) files; see cfpb.load.complaint_sources().
+        workers (int): Worker processes; defaults to the number of CPUs.
+        partition_size (int): Approximate bytes of CSV handled by one task.
+    """
+    frames = _map_partitions(_clean_partition, path, workers, partition_size)
+    if not frames:
+        return clean_complaints(_empty_frame())
+    return concat_frames(frames)
+
+
+def parallel_count_cube(path='Consumer_Complaints.csv', workers=None, partition_size=PARTITION_SIZE):
+    """ count_cube() of the cleaned complaints, reduced from per-partition counts without building the full frame. """
+    return merge_counts(_map_partitions(_count_partition, path, workers, partition_size))
+
+
+def parallel_sketches(path='Consumer_Complaints.csv', workers=None, partition_size=PARTITION_SIZE):
+    """ ComplaintSketches of the cleaned complaints, merged from per-partition sketches. """
+    return merge_sketches(_map_partitions(_sketch_partition, path, workers, partition_size))
@@ -0,0 +1,154 @@
+""" Per-stage instrumentation of the cleaning pipeline.
+
+The pipeline functions (load_complaints, parse_dates, normalize_labels, recategorize_products,
+the aggregation builders) each run inside profiling.stage(). While profiling is off, which is
+the default, a stage only creates one small record object; when it is on, each stage records
+wall time, process peak RSS, rows in/out and rows modified.
+
+    from cfpb import profiling
+    profiling.enable()            # or set CFPB_PROFILE=1
+    ...
+    profiling.report()            # console table
+    profiling.to_json('profile.json')
+
+Peak RSS is the process-wide high-water mark when the stage ends, so it only grows: a stage
+whose value is higher than the previous stage's raised the peak.
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_enabled = os.environ.get('CFPB_PROFILE', '') not in ('', '0')
+_records = []
+
+
+class StageRecord:
+    """ Measurements for one run of a named stage. Stages fill in rows_out, rows_modified and details. """
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.rows_modified = None
+        self.details = None
+        self.seconds = None
+        self.peak_rss_mb = None
+
+    def as_dict(self):
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process so far, in MB; None where it isn't available (Windows). """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """ Forget all recorded stages. """
+    _records.clear()
+
+
+def records():
+    return [record.as_dict() for record in _records]
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """Measure the enclosed block as stage `name`.
+
+    Yields:
+        StageRecord: set its rows_out / rows_modified / details from inside the block.
+    """
+    record = StageRecord(name, rows_in)
+    if not _enabled:
+        yield record
+        return
+    start = time.perf_counter()
+    yield record
+    record.seconds = time.perf_counter() - start
+    record.peak_rss_mb = peak_rss_mb()
+    _records.append(record)
+
+
+def profiled(name, modified=None, details=None):
+    """Decorator running a pipeline function as stage `name`.
+
+    rows_in is the length of the first DataFrame argument; rows_out is its length after the call,
+    or the length of the returned frame for functions that don't take one.
+
+    Arguments:
+        name (str): Stage name.
+        modified (callable): result -> number of rows the stage changed.
+        details (callable): result -> JSON-serializable breakdown, e.g. rows per rule.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            frame = next((arg for arg in args if isinstance(arg, pd.DataFrame)), None)
+            with stage(name, None if frame is None else len(frame)) as record:
+                result = func(*args, **kwargs)
+                if frame is not None:
+                    record.rows_out = len(frame)
+                elif isinstance(result, pd.DataFrame):
+                    record.rows_out = len(result)
+                if modified is not None:
+                    record.rows_modified = int(modified(result))
+                if details is not None:
+                    record.details = details(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def report(file=None):
+    """ Print the recorded stages as a table. """
+    if not _records:
+        return
+    file = file or sys.stdout
+    print(f"{'stage':<24} {'seconds':>9} {'peak RSS MB':>12} {'rows in':>11} {'rows out':>11} {'modified':>11}",
+          file=file)
+    for record in _records:
+        cells = [record.rows_in, record.rows_out, record.rows_modified]
+        cells = ['' if value is None else f'{value:,}' for value in cells]
+        rss = '' if record.peak_rss_mb is None else f'{record.peak_rss_mb:.1f}'
+        print(f'{record.name:<24} {record.seconds:>9.3f} {rss:>12} '
+              f'{cells[0]:>11} {cells[1]:>11} {cells[2]:>11}', file=file)
+
+
+def to_json(path=None):
+    """ Recorded stages as a JSON string, also written to `path` when given. """
+    text = json.dumps(records(), indent=2, default=str)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
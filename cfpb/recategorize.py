@@ -0,0 +1,92 @@
+""" Table-driven re-sorting of overlapping product categories (Clean Data (C)).
+
+Each rule is a (product, sub_product, new_product) row; None matches any value. Rules apply
+in order, exactly as the original chain of complaints.loc[...] assignments did, but they are
+evaluated once per distinct (product, sub_product) pair instead of once per row, and the result
+is mapped back onto the frame with a single categorical code lookup. The cost is one scan of
+the frame however many rules are added.
+"""
+
+import numpy as np
+import pandas as pd
+
+from cfpb.profiling import profiled
+
+CREDIT_CARD_GROUP = ['General-purpose credit card or charge card', 'Store credit card']
+
+PREPAID_CARD_GROUP = ['General-purpose prepaid card', 'Government benefit card', 'Payroll card',
+                      'Gift card', 'Student prepaid card']
+
+MONEY_SERVICE = 'Money transfer, virtual currency, or money service'
+PAYDAY_TITLE_PERSONAL = 'Payday loan, title loan, or personal loan'
+CREDIT_REPORTING = 'Credit reporting, credit repair services, or other personal consumer reports'
+
+PRODUCT_RULES = (
+    [(None, item, 'Credit card') for item in CREDIT_CARD_GROUP]
+    + [(None, item, 'Prepaid card') for item in PREPAID_CARD_GROUP]
+    + [
+        # All 'virtual currency' sub_products sorted into the 'Virtual currency' product group
+        (None, 'Virtual currency', 'Virtual currency'),
+        (None, 'Mobile or digital wallet', 'Virtual currency'),
+        # Money transfers, which originally were in the combined product group
+        (None, 'Domestic (US) money transfer', 'Money transfers'),
+        (None, 'International money transfer', 'Money transfers'),
+        (None, 'Foreign currency exchange', 'Money transfers'),
+        # Rename trimmed product group
+        (MONEY_SERVICE, None, 'Money service'),
+        (PAYDAY_TITLE_PERSONAL, 'Payday loan', 'Payday loan'),
+        (PAYDAY_TITLE_PERSONAL, 'Personal line of credit', 'Consumer loan'),
+        (PAYDAY_TITLE_PERSONAL, 'Installment loan', 'Consumer loan'),
+        (PAYDAY_TITLE_PERSONAL, 'Title loan', 'Consumer loan'),
+        (PAYDAY_TITLE_PERSONAL, 'Pawn loan', 'Consumer loan'),
+        # Shorten credit reporting product category name
+        (CREDIT_REPORTING, None, 'Credit reporting'),
+    ]
+)
+
+
+def _matches(value, pattern):
+    return pattern is None or value == pattern
+
+
+@profiled('recategorize_products', modified=lambda report: report['rows'].sum(),
+          details=lambda report: report.groupby('new_product')['rows'].sum().astype(int).to_dict())
+def recategorize_products(df, rules=PRODUCT_RULES):
+    """Re-sort df['product'] according to `rules`, in place.
+
+    Arguments:
+        df (pandas.DataFrame): Cleaned complaints with categorical 'product' and 'sub_product'.
+        rules (list): (product, sub_product, new_product) rows applied in order.
+
+    Returns:
+        pandas.DataFrame: One row per rule with the number of complaints it re-sorted.
+    """
+    product = df['product'].astype('category').cat
+    sub_product = df['sub_product'].astype('category').cat
+
+    # Encode each row's (product, sub_product) pair as one integer; -1 (NaN) codes shift to 0
+    n_sub = len(sub_product.categories) + 1
+    pair_keys = (product.codes.to_numpy(np.int64) + 1) * n_sub + (sub_product.codes.to_numpy(np.int64) + 1)
+    pairs, inverse = np.unique(pair_keys, return_inverse=True)
+    pair_counts = np.bincount(inverse, minlength=len(pairs))
+
+    product_labels = np.concatenate([[None], product.categories.to_numpy(object)])
+    sub_labels = np.concatenate([[None], sub_product.categories.to_numpy(object)])
+
+    # Run the rules over the distinct pairs only
+    new_products = product_labels[pairs // n_sub]
+    pair_subs = sub_labels[pairs % n_sub]
+    touched = np.zeros(len(rules), dtype=np.int64)
+    for i, (current, sub, new) in enumerate(rules):
+        for j in range(len(pairs)):
+            if _matches(new_products[j], current) and _matches(pair_subs[j], sub) and new_products[j] != new:
+                new_products[j] = new
+                touched[i] += pair_counts[j]
+
+    # Broadcast the per-pair result back to every row with one code lookup
+    categories = pd.Index(sorted({label for label in new_products if label is not None}))
+    pair_codes = np.array([-1 if label is None else categories.get_loc(label) for label in new_products],
+                          dtype=np.int32)
+    df['product'] = pd.Categorical.from_codes(pair_codes[inverse], categories=categories)
+
+    return pd.DataFrame(rules, columns=['product', 'sub_product', 'new_product']).assign(rows=touched)
@@ -0,0 +1,108 @@
+""" Headless batch rendering of the report's bar charts.
+
+render_report() writes the top-products chart and, for every product, its sub_product and
+issue bar charts as PNG/SVG files, without a display (Agg backend). Charts are split into one
+batch per worker process; each worker draws its batch on a single reused Figure, and bar
+labels are added per bar container (Axes.bar_label) rather than one annotation per patch.
+
+matplotlib is only imported by the functions that draw.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from cfpb.aggregate import summary_tables
+
+BAR_COLOR = (246 / 255, 168 / 255, 78 / 255)
+TOP_PRODUCT_SHARE = 0.05
+MAX_BARS = 15
+
+
+def _slug(name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(name)).strip('_').lower()
+
+
+def chart_specs(tables, max_bars=MAX_BARS):
+    """List the report's charts as plain, picklable dicts.
+
+    Arguments:
+        tables (dict): Output of cfpb.summary_tables().
+        max_bars (int): Largest number of bars drawn in a per-product chart.
+    """
+    products = tables['products']
+    top = products[products['perc_total'] > TOP_PRODUCT_SHARE]
+    specs = [{'name': 'top_products', 'title': f'Top {len(top)} most complained about products',
+              'labels': [str(label) for label in top.index], 'values': top['perc_total'].tolist(),
+              'percent': True, 'horizontal': False}]
+    for product in products.index:
+        sub_products = tables['sub_products_by_product'].get(product)
+        for kind, counts in [('sub_products', sub_products), ('issues', tables['issues'].get(product))]:
+            if counts is None or not len(counts):
+                continue
+            counts = counts.head(max_bars)
+            specs.append({'name': f'{_slug(product)}_{kind}', 'title': f"{product}: {kind.replace('_', '-')}",
+                          'labels': [str(label) for label in counts.index], 'values': counts.tolist(),
+                          'percent': False, 'horizontal': kind == 'issues'})
+    return specs
+
+
+def _draw(fig, spec):
+    """ Draw one chart on `fig`, styled like the notebook's top-products chart. """
+    fig.clf()
+    ax = fig.add_subplot()
+    if spec['horizontal']:
+        # Largest bar on top
+        bars = ax.barh(spec['labels'][::-1], spec['values'][::-1], color=BAR_COLOR)
+    else:
+        bars = ax.bar(spec['labels'], spec['values'], color=BAR_COLOR)
+        ax.tick_params(axis='x', labelrotation=90)
+    for side in ['left', 'bottom', 'top', 'right']:
+        ax.spines[side].set_visible(False)
+    labels = [f'{value * 100:.0f}%' for value in spec['values']] if spec['percent'] else None
+    if spec['horizontal']:
+        ax.bar_label(bars, padding=3)
+        ax.set_xticks([])
+    else:
+        ax.bar_label(bars, labels=labels, padding=5)
+        ax.set_yticks([])
+    ax.set_title(spec['title'], fontweight='bold', ha='center', pad=25)
+    fig.tight_layout()
+
+
+def _render_batch(task):
+    specs, out_dir, formats = task
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    # One Figure per worker, cleared between charts; no pyplot, so no display is needed
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    for spec in specs:
+        _draw(fig, spec)
+        for fmt in formats:
+            fig.savefig(os.path.join(out_dir, f"{spec['name']}.{fmt}"), format=fmt)
+
+
+def render_charts(specs, out_dir, formats=('png',), workers=None):
+    """Render chart specs to files in `out_dir`, in parallel worker processes.
+
+    Returns:
+        list: Paths written, in the order of `specs`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    batches = [specs[i::workers] for i in range(workers) if specs[i::workers]]
+    tasks = [(batch, out_dir, formats) for batch in batches]
+    if len(tasks) <= 1:
+        for task in tasks:
+            _render_batch(task)
+    else:
+        with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+            list(pool.map(_render_batch, tasks))
+    return [os.path.join(out_dir, f"{spec['name']}.{fmt}") for spec in specs for fmt in formats]
+
+
+def render_report(cube, out_dir='report', formats=('png', 'svg'), workers=None):
+    """ Render every report chart for a ComplaintCube into `out_dir`. """
+    return render_charts(chart_specs(summary_tables(cube)), out_dir, formats, workers)
@@ -0,0 +1,98 @@
+""" Compact dtype schema for the cleaned complaints frame.
+
+All of the label columns have low cardinality (18 products, 77 sub_products, a few thousand
+companies, ...), so they are stored as pandas 'category' columns: comparisons and
+value_counts() then run on integer codes instead of Python strings.
+
+'zip' (STRING_COLS) is different: masked CFPB zip codes such as '100XX' rule out an integer
+type, and an export has tens of thousands of distinct codes, too many for a category to save
+much memory. Sorting that many categories chunk by chunk also made it the slowest column to
+load. With pyarrow installed it is an Arrow string column, at about 9 bytes per zip code. Without
+pyarrow it falls back to a category whose categories are left in order of first appearance in
+the export, which doesn't depend on how the export is cut into chunks. 'disputed' becomes a
+nullable boolean.
+"""
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+CATEGORY_COLS = ['product', 'sub_product', 'issue', 'sub_issue', 'company', 'state', 'company_response_to_consumer']
+STRING_COLS = ['zip']
+STRING_DTYPE = 'string[pyarrow]' if pyarrow is not None else 'category'
+
+# 'Consumer disputed?' answers; anything else ('N/A', blank) becomes <NA>
+DISPUTED_VALUES = {'Yes': True, 'No': False}
+
+
+def read_dtypes(columns):
+    """read_csv dtype mapping for the raw headers in `columns` (raw header -> new name).
+
+    'date_received' is read as a category too: the raw strings repeat heavily, and
+    cfpb.clean.parse_dates only has to parse each distinct one.
+    """
+    dtypes = {raw: 'category' for raw, new in columns.items() if new in CATEGORY_COLS or new == 'date_received'}
+    # Read as strings: a chunk where every answer is blank would otherwise be parsed as floats, and
+    # one without masked zip codes as integers, losing their leading zeros
+    dtypes.update({raw: str for raw, new in columns.items() if new == 'disputed' or new in STRING_COLS})
+    return dtypes
+
+
+def apply_schema(df):
+    """Cast the cleaned columns of `df` to the compact schema, in place.
+
+    Columns that already have their type are left untouched, so this is cheap to call on
+    chunks that were parsed with read_dtypes(), or on a frame read back from Parquet (which
+    returns Arrow strings as Python ones).
+    """
+    for col in CATEGORY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in STRING_COLS:
+        if col in df.columns and df[col].dtype != STRING_DTYPE:
+            if STRING_DTYPE == 'category':
+                codes, uniques = pd.factorize(df[col])
+                df[col] = pd.Categorical.from_codes(codes, uniques)
+            else:
+                df[col] = df[col].astype(STRING_DTYPE)
+    if 'disputed' in df.columns and df['disputed'].dtype != 'boolean':
+        df['disputed'] = df['disputed'].map(DISPUTED_VALUES).astype('boolean')
+    return df
+
+
+def codes_and_uniques(values):
+    """(codes, uniques) of a column: its category codes and categories, or pd.factorize() of any
+    other column. Code -1 is a missing value.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+
+def concat_frames(frames):
+    """Concatenate chunks while keeping categorical columns categorical.
+
+    pd.concat falls back to object dtype when chunks have different categories, so the
+    categories of every categorical column are unioned first (in chunk order, for STRING_COLS).
+    """
+    frames = list(frames)
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    combined = {}
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            combined[col] = union_categoricals([frame[col] for frame in frames],
+                                               sort_categories=col not in STRING_COLS)
+        else:
+            combined[col] = pd.concat([frame[col] for frame in frames], ignore_index=True)
+    return pd.DataFrame(combined)
+
+
+def value_counts(series):
+    """ series.value_counts() without the 0-count rows a categorical column reports for its unused categories. """
+    counts = series.value_counts()
+    return counts[counts > 0]
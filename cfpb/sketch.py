@@ -0,0 +1,335 @@
+""" Approximate, mergeable summaries of the cleaned complaints for interactive exploration.
+
+ComplaintSketches answers the value_counts()-style questions of the notebook from a few MB of
+sketches instead of the rows:
+
+    count(product='Mortgage')                   CountMinSketch
+    value_counts('issue', product='Mortgage')   SpaceSaving (top labels), CountMinSketch (counts)
+    distinct('company', product='Mortgage')     HyperLogLog
+
+for every column of SKETCH_COLS, and with one filter for the (filter, column) pairs of
+SKETCH_PAIRS. Error bounds, where N is the number of rows sketched (every row with both labels
+of a pair, whatever the filter asks for):
+
+    CountMinSketch  never under-counts; over-counts by at most epsilon * N with probability
+                    at least 1 - delta (CM_EPSILON = 0.1% of N, CM_DELTA = 1%). A pair's
+                    labels all share one table, so a filtered count gets the same absolute
+                    bound as an unfiltered one.
+    SpaceSaving     one summary per filter label; with M rows under that label, every label
+                    with more than M / (k + 1) of them is kept, and its count is over by at
+                    most `error` <= M / (k + 1). value_counts() reports the smaller of the
+                    SpaceSaving and CountMinSketch counts, both upper bounds.
+    HyperLogLog     relative standard error 1.04 / sqrt(2 ** precision): 1.6% at the default
+                    HLL_PRECISION = 12.
+
+All three only depend on the multiset of rows, and merge() of the sketches of two partitions
+(of a file, of two days' deltas) is the sketch of their union, with the same bounds. Labels
+are hashed with blake2b rather than Python's salted hash(), so sketches built in different
+processes or sessions merge correctly. Missing labels are not sketched, as in value_counts().
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from cfpb.cache import atomic_replace_dir
+from cfpb.profiling import profiled
+
+SKETCH_COLS = ['product', 'sub_product', 'issue', 'sub_issue', 'company', 'state']
+
+# (filter column, counted column) pairs answered with one filter, e.g. distinct companies per product
+SKETCH_PAIRS = [('product', 'sub_product'), ('product', 'issue'), ('product', 'sub_issue'), ('product', 'company'),
+                ('product', 'state'), ('issue', 'sub_issue'), ('state', 'company'), ('state', 'product')]
+
+CM_EPSILON = 0.001
+CM_DELTA = 0.01
+HLL_PRECISION = 12
+TOP_K = 50
+
+SKETCH_DIR = '.cfpb_sketches'
+
+# Bump when the files written by save() change
+SKETCH_FORMAT = 2
+
+
+def hash_labels(labels):
+    """ Stable 64-bit hash of each label (the same in every process and session). """
+    return np.fromiter((int.from_bytes(hashlib.blake2b(str(label).encode(), digest_size=8).digest(), 'little')
+                        for label in labels), dtype=np.uint64, count=len(labels))
+
+
+def _pair_hashes(groups, labels):
+    return hash_labels([f'{group}\x1f{label}' for group, label in zip(groups, labels)])
+
+
+class CountMinSketch:
+    """Frequency estimates of hashed keys in a depth x width table of counters.
+
+    Arguments:
+        epsilon (float): Over-count bound, as a share of the total count.
+        delta (float): Probability of exceeding that bound.
+    """
+
+    def __init__(self, epsilon=CM_EPSILON, delta=CM_DELTA, table=None):
+        width, depth = math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta))
+        self.epsilon, self.delta = epsilon, delta
+        self.table = np.zeros((depth, width), dtype=np.int64) if table is None else table
+
+    def _columns(self, hashes):
+        # Row i uses (h1 + i * h2) mod width, from the two halves of the 64-bit hash
+        depth, width = self.table.shape
+        h1, h2 = hashes & np.uint64(0xFFFFFFFF), (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(depth, dtype=np.uint64)[:, None]
+        return ((h1 + rows * h2) % np.uint64(width)).astype(np.intp)
+
+    def add(self, hashes, counts):
+        columns = self._columns(hashes)
+        for row, row_columns in enumerate(columns):
+            np.add.at(self.table[row], row_columns, counts)
+
+    def estimate(self, hashes):
+        columns = self._columns(hashes)
+        return self.table[np.arange(len(columns))[:, None], columns].min(axis=0)
+
+    def merge(self, other):
+        return CountMinSketch(self.epsilon, self.delta, self.table + other.table)
+
+
+class HyperLogLog:
+    """Distinct-count estimate from 2 ** precision registers of hashed values.
+
+    Arguments:
+        precision (int): Number of hash bits used to pick a register, 11 to 18.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    def add(self, hashes):
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # frexp's exponent is the bit length; rest < 2 ** 53 converts to float exactly
+        _, length = np.frexp(rest.astype(np.float64))
+        np.maximum.at(self.registers, index, (bits - length + 1).astype(np.uint8))
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+    def merge(self, other):
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+
+class SpaceSaving:
+    """The k most frequent labels, with their counts up to a shared over-count `error`.
+
+    Kept in the equivalent Misra-Gries form, lower-bound counts plus `error`, so that merging
+    two summaries is the standard reduction: add the counts, then subtract the (k + 1)-th
+    largest from all of them. Each reduction removes at least k + 1 times what it adds to
+    `error`, so `error` stays at most (rows - sum(counts)) / (k + 1).
+
+    Arguments:
+        k (int): Number of labels kept.
+        counts (dict): Label -> lower bound of its count.
+        error (int): What every count, or the count of a label that isn't kept, may be missing.
+    """
+
+    def __init__(self, k=TOP_K, counts=None, error=0):
+        self.k = k
+        self.counts = {} if counts is None else counts
+        self.error = error
+
+    def add(self, labels, counts):
+        """ Add exact counts of `labels`. """
+        merged = self.merge(SpaceSaving(self.k, dict(zip(labels, counts.tolist()))))
+        self.counts, self.error = merged.counts, merged.error
+
+    def merge(self, other):
+        counts = dict(self.counts)
+        for label, count in other.counts.items():
+            counts[label] = counts.get(label, 0) + count
+        error = self.error + other.error
+        if len(counts) > self.k:
+            cut = heapq.nlargest(self.k + 1, counts.values())[-1]
+            counts = {label: count - cut for label, count in counts.items() if count > cut}
+            error += cut
+        return SpaceSaving(self.k, counts, error)
+
+
+class ComplaintSketches:
+    """Count-min, HyperLogLog and space-saving sketches of the label columns of the complaints.
+
+    For each target (None, column) of SKETCH_COLS and (filter, column) of SKETCH_PAIRS, keeps
+    one CountMinSketch over its labels (or (filter label, label) pairs) and, per filter label,
+    a HyperLogLog and a SpaceSaving summary.
+    """
+
+    def __init__(self, columns=SKETCH_COLS, pairs=SKETCH_PAIRS, epsilon=CM_EPSILON, delta=CM_DELTA,
+                 precision=HLL_PRECISION, k=TOP_K):
+        self.options = {'columns': list(columns), 'pairs': [list(pair) for pair in pairs], 'epsilon': epsilon,
+                        'delta': delta, 'precision': precision, 'k': k}
+        self.rows = 0
+        self.targets = [(None, col) for col in columns] + [tuple(pair) for pair in pairs]
+        self.frequencies = {target: CountMinSketch(epsilon, delta) for target in self.targets}
+        self.distinct_counts = {target: {} for target in self.targets}
+        self.heavy_hitters = {target: {} for target in self.targets}
+        self._answers = {}
+
+    @classmethod
+    @profiled('sketches', details=lambda sketches: {'rows': sketches.rows})
+    def from_frame(cls, df, **options):
+        sketches = cls(**options)
+        sketches.update(df)
+        return sketches
+
+    def update(self, df):
+        """ Add the rows of the cleaned frame `df`. """
+        self.rows += len(df)
+        self._answers.clear()
+        for target in self.targets:
+            key, col = target
+            counts = df.groupby([col] if key is None else [key, col], observed=True).size()
+            counts = counts[counts > 0]
+            if key is None:
+                groups, labels = np.full(len(counts), None, dtype=object), counts.index
+                hashes = hash_labels(labels)
+            else:
+                groups, labels = counts.index.get_level_values(0), counts.index.get_level_values(1)
+                hashes = _pair_hashes(groups, labels)
+            self.frequencies[target].add(hashes, counts.to_numpy())
+
+            label_hashes = hash_labels(labels)
+            group_codes, group_labels = pd.factorize(groups) if key is not None else (np.zeros(len(counts)), [None])
+            order = np.argsort(group_codes, kind='stable')
+            bounds = np.searchsorted(group_codes[order], np.arange(len(group_labels) + 1))
+            for i, group in enumerate(group_labels):
+                positions = order[bounds[i]:bounds[i + 1]]
+                distinct = self.distinct_counts[target].setdefault(group, HyperLogLog(self.options['precision']))
+                distinct.add(label_hashes[positions])
+                top = self.heavy_hitters[target].setdefault(group, SpaceSaving(self.options['k']))
+                top.add(labels[positions], counts.to_numpy()[positions])
+
+    def merge(self, other):
+        """ Sketches of the rows of both; they must have been built with the same options. """
+        if other.options != self.options:
+            raise ValueError(f'cannot merge sketches built with different options: {self.options} vs {other.options}')
+        merged = ComplaintSketches(**self.options)
+        merged.rows = self.rows + other.rows
+        for target in self.targets:
+            merged.frequencies[target] = self.frequencies[target].merge(other.frequencies[target])
+            # Merging with an empty sketch copies, so the result shares no state with self or other
+            for name, empty in [('distinct_counts', HyperLogLog(self.options['precision'])),
+                                ('heavy_hitters', SpaceSaving(self.options['k']))]:
+                mine, theirs = getattr(self, name)[target], getattr(other, name)[target]
+                getattr(merged, name)[target] = {group: mine.get(group, empty).merge(theirs.get(group, empty))
+                                                 for group in {**mine, **theirs}}
+        return merged
+
+    def _target(self, column, where):
+        if len(where) > 1:
+            raise KeyError(f'sketches answer at most one filter, got {list(where)}')
+        (key, group), = where.items() if where else [(None, None)]
+        if (key, column) not in self.frequencies:
+            raise KeyError(f'{(key, column)} is not sketched; sketched: {self.targets}')
+        return (key, column), group
+
+    def count(self, **where):
+        """ Estimated number of rows matching the filters (one or two columns of a sketched pair). """
+        if not where:
+            return self.rows
+        if len(where) == 1:
+            (col, label), = where.items()
+            target, hashes = (None, col), hash_labels([label])
+        else:
+            (key, group), (col, label) = where.items()
+            if (key, col) not in self.frequencies:
+                key, group, col, label = col, label, key, group
+            target, hashes = (key, col), _pair_hashes([group], [label])
+        if target not in self.frequencies:
+            raise KeyError(f'{target} is not sketched; sketched: {self.targets}')
+        return int(self.frequencies[target].estimate(hashes)[0])
+
+    def value_counts(self, column, k=None, **where):
+        """Approximate df.loc[<filter>, column].value_counts().head(k) for the heavy hitters.
+
+        At most `k` (default: the summary size) labels; counts are upper bounds, see the module
+        docstring.
+        """
+        target, group = self._target(column, where)
+        if (target, group) not in self._answers:
+            top = self.heavy_hitters[target].get(group, SpaceSaving(self.options['k']))
+            labels = pd.Index(list(top.counts), dtype=object)
+            hashes = hash_labels(labels) if group is None else _pair_hashes([group] * len(labels), labels)
+            counts = np.minimum(np.array(list(top.counts.values()), dtype=np.int64) + top.error,
+                                self.frequencies[target].estimate(hashes))
+            order = np.lexsort((labels.astype(str), -counts))
+            self._answers[target, group] = pd.Series(counts[order], index=labels[order].rename(column), name='count')
+        return self._answers[target, group].iloc[:k]
+
+    def distinct(self, column, **where):
+        """ Estimated number of distinct labels of `column` in the rows matching the filter. """
+        target, group = self._target(column, where)
+        if ('distinct', target, group) not in self._answers:
+            sketch = self.distinct_counts[target].get(group)
+            self._answers['distinct', target, group] = 0 if sketch is None else sketch.count()
+        return self._answers['distinct', target, group]
+
+    def save(self, sketch_dir=SKETCH_DIR):
+        """ Write the sketches to `sketch_dir` (sketches.json and sketches.npz), replacing it. """
+        def write(tmp_dir):
+            arrays, targets = {}, []
+            for i, target in enumerate(self.targets):
+                groups = list(self.distinct_counts[target])
+                arrays[f'cms{i}'] = self.frequencies[target].table
+                arrays[f'hll{i}'] = np.stack([self.distinct_counts[target][group].registers for group in groups]
+                                             or [HyperLogLog(self.options['precision']).registers])
+                top = {json.dumps(group): {'counts': list(summary.counts.items()), 'error': summary.error}
+                       for group, summary in self.heavy_hitters[target].items()}
+                targets.append({'groups': groups, 'top': top})
+            np.savez(os.path.join(tmp_dir, 'sketches.npz'), **arrays)
+            with open(os.path.join(tmp_dir, 'sketches.json'), 'w') as f:
+                json.dump({'format': SKETCH_FORMAT, 'options': self.options, 'rows': self.rows, 'targets': targets}, f)
+
+        atomic_replace_dir(sketch_dir, write)
+
+    @classmethod
+    def load(cls, sketch_dir=SKETCH_DIR):
+        """ Read sketches written by save(). """
+        with open(os.path.join(sketch_dir, 'sketches.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != SKETCH_FORMAT:
+            raise ValueError(f"{sketch_dir} holds sketches in format {meta.get('format')}, expected {SKETCH_FORMAT}")
+        sketches = cls(**meta['options'])
+        sketches.rows = meta['rows']
+        options = sketches.options
+        with np.load(os.path.join(sketch_dir, 'sketches.npz')) as arrays:
+            for i, (target, saved) in enumerate(zip(sketches.targets, meta['targets'])):
+                sketches.frequencies[target] = CountMinSketch(options['epsilon'], options['delta'], arrays[f'cms{i}'])
+                registers = arrays[f'hll{i}']
+                sketches.distinct_counts[target] = {group: HyperLogLog(options['precision'], registers[j].copy())
+                                                    for j, group in enumerate(saved['groups'])}
+                sketches.heavy_hitters[target] = {
+                    json.loads(group): SpaceSaving(options['k'], dict(top['counts']), top['error'])
+                    for group, top in saved['top'].items()}
+        return sketches
+
+
+def merge_sketches(parts):
+    """ Merge a list of ComplaintSketches (empty sketches for an empty list). """
+    if not parts:
+        return ComplaintSketches()
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = merged.merge(part)
+    return merged
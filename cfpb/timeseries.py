@@ -0,0 +1,93 @@
+""" Complaint volume over time, per product, company or state.
+
+ComplaintTimeSeries counts the frame once into a dense (label x day) matrix. Weekly,
+monthly, ... matrices are column sums of the daily one, and trend queries (a label's series,
+rolling windows, period-over-period change) are slices and cumulative sums of those arrays,
+so none of them goes back to the rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from cfpb.profiling import profiled
+
+
+class ComplaintTimeSeries:
+    """Daily complaint counts for each label of one column.
+
+    Arguments:
+        labels (pandas.Index): Row labels of `daily`.
+        days (pandas.DatetimeIndex): Consecutive days, the columns of `daily`.
+        daily (numpy.ndarray): Complaint counts, shape (len(labels), len(days)).
+    """
+
+    def __init__(self, labels, days, daily):
+        self.labels = labels
+        self.days = days
+        self._matrices = {'D': (days.to_period('D'), daily)}
+
+    @classmethod
+    @profiled('time_series')
+    def from_frame(cls, df, column='product'):
+        """ Count df by `column` and 'date_received' in one pass. Rows without a date or label are skipped. """
+        labels = df[column].astype('category').cat
+        dates = df['date_received'].to_numpy('datetime64[D]')
+        keep = ~np.isnat(dates) & (labels.codes.to_numpy() >= 0)
+        if not keep.any():
+            return cls(labels.categories, pd.DatetimeIndex([]), np.zeros((len(labels.categories), 0), np.int64))
+
+        day_numbers = dates[keep].astype(np.int64)
+        first = day_numbers.min()
+        n_days = day_numbers.max() - first + 1
+        n_labels = len(labels.categories)
+        keys = labels.codes.to_numpy()[keep].astype(np.int64) * n_days + (day_numbers - first)
+        daily = np.bincount(keys, minlength=n_labels * n_days).reshape(n_labels, n_days)
+        days = pd.date_range(pd.Timestamp(first, unit='D'), periods=n_days, freq='D')
+        return cls(labels.categories, days, daily)
+
+    def matrix(self, freq='D'):
+        """Counts per label and period.
+
+        Arguments:
+            freq (str): Pandas period alias: 'D', 'W', 'M', 'Q', 'Y', ...
+
+        Returns:
+            tuple: (pandas.PeriodIndex, numpy.ndarray of shape (len(labels), len(periods))).
+        """
+        if freq not in self._matrices:
+            periods = self.days.to_period(freq)
+            starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]]) if len(periods) else np.array([], int)
+            daily = self._matrices['D'][1]
+            summed = np.add.reduceat(daily, starts, axis=1) if len(starts) else daily
+            self._matrices[freq] = (periods[starts], summed)
+        return self._matrices[freq]
+
+    def _row(self, label):
+        return self.labels.get_loc(label)
+
+    def counts(self, label=None, freq='D'):
+        """ Series of counts per period for one label, or a period x label DataFrame when label is None. """
+        periods, matrix = self.matrix(freq)
+        if label is None:
+            return pd.DataFrame(matrix.T, index=periods, columns=self.labels)
+        return pd.Series(matrix[self._row(label)], index=periods, name=label)
+
+    def rolling(self, label, window, freq='D'):
+        """ Sum of counts over the last `window` periods (NaN until the window is full). """
+        periods, matrix = self.matrix(freq)
+        cumulative = np.cumsum(matrix[self._row(label)], dtype=np.float64)
+        rolled = np.full(len(periods), np.nan)
+        if window <= len(periods):
+            rolled[window - 1:] = cumulative[window - 1:] - np.r_[0.0, cumulative[:-window]]
+        return pd.Series(rolled, index=periods, name=label)
+
+    def change(self, label, freq='M', periods=1):
+        """ Relative change in counts versus `periods` periods earlier (NaN where the earlier count is 0). """
+        index, matrix = self.matrix(freq)
+        row = matrix[self._row(label)].astype(np.float64)
+        result = np.full(len(index), np.nan)
+        if periods < len(index):
+            previous = row[:-periods]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result[periods:] = np.where(previous > 0, row[periods:] / previous - 1, np.nan)
+        return pd.Series(result, index=index, name=label)
@@ -0,0 +1,277 @@
+""" Data-quality checks run between the cleaning steps.
+
+validate() looks at a complaints frame, and optionally at a snapshot of it taken before the
+last step, and returns one row per violation:
+
+    nulls       more missing values than NULL_RATE_LIMITS allows (a warning for those the step
+                set and reported itself, see REPORTED_NULLS)
+    category    a label outside ALLOWED_LABELS
+    format      a state that isn't a USPS code/name or a zip code that isn't a (masked) ZIP
+    date_range  date_received outside DATE_RANGE
+    row_count   rows added or lost by the step
+    unchanged   values changed in a column the step doesn't own, e.g. by a row-wide
+                complaints.loc[mask] = value assignment
+
+Label checks only look at the distinct values of each label column, and after a step only the
+columns it owns are checked again: the others are compared with the Snapshot taken before it,
+which holds on to each column's array instead of copying it and only compares the values of
+a column whose buffers changed. A check costs about as much as one value_counts() per owned
+column. Unknown labels and format problems are warnings (the CFPB
+adds products now and then, and the data has some junk ZIP codes); everything else is an
+error, and Validator raises ValidationError with the compact report.
+"""
+
+import functools
+import warnings
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from cfpb.geo import states
+from cfpb.labels import LABEL_COLS, LABEL_MAP
+from cfpb.profiling import profiled
+from cfpb.recategorize import PRODUCT_RULES
+from cfpb.schema import codes_and_uniques
+
+# Products in the CFPB export, before and after the 2017 product list change
+PRODUCTS = ['Bank account or service', 'Checking or savings account', 'Consumer Loan', 'Credit card',
+            'Credit card or prepaid card', 'Credit reporting',
+            'Credit reporting, credit repair services, or other personal consumer reports', 'Debt collection',
+            'Money transfer, virtual currency, or money service', 'Money transfers', 'Mortgage',
+            'Other financial service', 'Payday loan', 'Payday loan, title loan, or personal loan', 'Prepaid card',
+            'Student loan', 'Vehicle loan or lease', 'Virtual currency']
+
+RESPONSES = ['Closed', 'Closed with explanation', 'Closed with monetary relief', 'Closed with non-monetary relief',
+             'Closed with relief', 'Closed without relief', 'In progress', 'Untimely response']
+
+# Raw labels, their canonical forms and the products the re-sorting rules create
+ALLOWED_LABELS = {
+    'product': set(PRODUCTS) | set(LABEL_MAP.get('product', {}).values()) | {new for _, _, new in PRODUCT_RULES},
+    'company_response_to_consumer': set(RESPONSES),
+}
+
+NULL_RATE_LIMITS = {'date_received': 0.0, 'product': 0.0, 'issue': 0.0, 'company': 0.0}
+
+# Columns in which a step sets values missing on purpose and says so: parse_dates turns malformed
+# dates into NaT with a warning (or raises, with strict=True)
+REPORTED_NULLS = {'parse_dates': ['date_received']}
+
+# The CFPB started taking complaints on 2011-07-21; the upper bound is "today"
+DATE_RANGE = (pd.Timestamp('2011-07-21'), None)
+
+# Columns each cleaning step may change; every other column must come out as it went in
+STEP_COLUMNS = {
+    'parse_dates': ['date_received'],
+    'normalize_labels': LABEL_COLS,
+    'recategorize_products': ['product'],
+}
+
+REPORT_COLUMNS = ['check', 'column', 'rows', 'detail', 'severity']
+
+
+class ValidationError(ValueError):
+    """ Raised by Validator; `report` holds the violations as returned by validate(). """
+
+    def __init__(self, stage, report):
+        self.report = report
+        super().__init__(f'{len(report)} data-quality violation(s) after {stage}:\n{report.to_string(index=False)}')
+
+
+@functools.lru_cache(maxsize=None)
+def _state_labels():
+    table = states()
+    return frozenset(table.index) | frozenset(table['name'].str.upper())
+
+
+def _examples(labels, limit=3):
+    return ', '.join(repr(label) for label in list(labels)[:limit])
+
+
+def _strings(labels):
+    """ `labels` as strings; Arrow strings are kept, so that regular expressions run in pyarrow. """
+    return labels if isinstance(labels.dtype, pd.StringDtype) else labels.astype(str)
+
+
+def _labels(categories):
+    return categories.astype(str).str.strip().str.upper()
+
+
+# (check, column, categories -> mask of valid labels, message, severity)
+LABEL_CHECKS = [
+    ('category', 'product', lambda labels: labels.isin(ALLOWED_LABELS['product']), 'unknown labels', 'warning'),
+    ('category', 'company_response_to_consumer',
+     lambda labels: labels.isin(ALLOWED_LABELS['company_response_to_consumer']), 'unknown labels', 'warning'),
+    ('format', 'state', lambda labels: _labels(labels).isin(_state_labels()), 'malformed values', 'warning'),
+    # 5-digit or masked ('021XX') ZIP, ZIP+4, or a ZIP that lost its leading zero (see cfpb.geo)
+    ('format', 'zip', lambda labels: _strings(labels).str.fullmatch(r'\s*(\d{3}[\dXx]{2}(-\d{4})?|\d{4})\s*'),
+     'malformed values', 'warning'),
+]
+
+
+def _invalid_labels(values, is_valid):
+    """ (rows, labels) of the distinct values of `values` that is_valid(labels) rejects. """
+    codes, labels = codes_and_uniques(values)
+    counts = np.bincount(codes + 1, minlength=len(labels) + 1)[1:]
+    bad = (counts > 0) & ~np.asarray(is_valid(labels), dtype=bool)
+    return int(counts[bad].sum()), labels[bad]
+
+
+def null_rates(df):
+    """ Share of missing values in each column of `df`. """
+    return df.isna().mean() if len(df) else pd.Series(0.0, index=df.columns)
+
+
+def _fingerprint(array):
+    """Token that changes whenever the values of `array` (a column's .array) change, found
+    without looking at the values one by one: a CRC of the category codes or of the numpy
+    buffer, or the Arrow data itself, which is immutable.
+    """
+    if isinstance(array, pd.Categorical):
+        return zlib.crc32(np.ascontiguousarray(array.codes))
+    if isinstance(array, pd.arrays.ArrowExtensionArray):
+        return array.__arrow_array__()
+    if isinstance(array.dtype, pd.api.extensions.ExtensionDtype) and array.dtype.kind in 'biuf':
+        # Nullable boolean/integer/float columns
+        values = array.to_numpy('float64', na_value=np.nan)
+    else:
+        values = np.asarray(array)
+    if values.dtype == object:
+        values = pd.util.hash_array(values)
+    return zlib.crc32(np.ascontiguousarray(values))
+
+
+def _same(old, new):
+    return old == new if isinstance(old, int) else old is new
+
+
+class Snapshot:
+    """Row count, column names, missing values (of the NULL_RATE_LIMITS columns) and column
+    arrays of a frame, to compare it with itself after a cleaning step.
+
+    Nothing is copied: the snapshot keeps a reference to the array of each of `columns`
+    (default: every column) and its _fingerprint(). Columns the step replaced, and Arrow
+    columns, keep their old values in the snapshot and are compared row by row; any other
+    column changed in place (e.g. by df.loc[mask, col] = value) no longer has them, so its
+    changed rows can't be counted.
+    """
+
+    def __init__(self, df, columns=None):
+        self.rows = len(df)
+        self.names = list(df.columns)
+        self.missing = {col: int(df[col].isna().sum()) for col in NULL_RATE_LIMITS if col in df.columns}
+        self.columns = {}
+        for col in df.columns if columns is None else columns:
+            array = df[col].array
+            self.columns[col] = (array, _fingerprint(array))
+
+    def changed_rows(self, col, values):
+        """Number of rows whose value in `col` differs from the snapshot (missing == missing), or
+        None when the column was changed in place.
+        """
+        old, fingerprint = self.columns[col]
+        new = values.array
+        if _same(fingerprint, _fingerprint(new)):
+            return 0
+        if not isinstance(fingerprint, int):
+            old = type(old)(fingerprint)  # the Arrow data before the step
+        elif new is old or _same(_fingerprint(old), _fingerprint(new)):
+            return None
+        if isinstance(old, pd.Categorical) and isinstance(new, pd.Categorical):
+            # Old codes translated to the new categories; -2 for a label that no longer exists
+            lookup = new.categories.get_indexer(old.categories)
+            lookup = np.append(np.where(lookup < 0, -2, lookup), -1)
+            return int((lookup[old.codes] != new.codes).sum())
+        old, new = pd.Series(old, copy=False), pd.Series(new, copy=False)
+        if old.dtype == object or new.dtype == object or old.dtype != new.dtype:
+            # Factorizing both together gives equal values equal codes, and every missing value -1
+            codes, _ = pd.factorize(pd.concat([old.astype(object), new.astype(object)], ignore_index=True))
+            return int((codes[:len(old)] != codes[len(old):]).sum())
+        same = old.eq(new).fillna(False).astype(bool) | (old.isna() & new.isna())
+        return int((~same).sum())
+
+
+@profiled('validate')
+def validate(df, previous=None, step=None):
+    """Check `df`, and compare it with `previous` (a Snapshot taken before `step`) if given.
+
+    Returns:
+        pandas.DataFrame: One row per violation (check, column, rows, detail, severity); empty
+            when everything passes. `rows` is <NA> for a column changed in place.
+    """
+    violations = []
+    n = len(df)
+
+    # After a step, only the columns it owns (and any it added) are checked again
+    owned = STEP_COLUMNS.get(step, [])
+    compare = previous is not None and previous.rows == n
+    checked = [col for col in df.columns if not compare or col in owned or col not in previous.names]
+
+    for col, limit in NULL_RATE_LIMITS.items():
+        if col in checked and n:
+            missing = int(df[col].isna().sum())
+            reported = 0
+            if compare and col in REPORTED_NULLS.get(step, []):
+                reported = max(missing - previous.missing[col], 0)
+            if missing - reported > limit * n:
+                violations.append(('nulls', col, missing, f'{missing / n:.3%} missing, limit {limit:.2%}', 'error'))
+            elif reported:
+                violations.append(('nulls', col, reported, f'missing values reported by {step}', 'warning'))
+
+    for check, col, is_valid, message, severity in LABEL_CHECKS:
+        if col in checked:
+            rows, labels = _invalid_labels(df[col], is_valid)
+            if rows:
+                violations.append((check, col, rows, f'{message} {_examples(labels)}', severity))
+
+    dates = df['date_received'] if 'date_received' in checked else None
+    if dates is not None and pd.api.types.is_datetime64_any_dtype(dates):
+        first, last = DATE_RANGE
+        last = last if last is not None else pd.Timestamp.today().normalize()
+        outside = (dates < first) | (dates > last)
+        if outside.any():
+            violations.append(('date_range', 'date_received', int(outside.sum()),
+                               f'{dates[outside].min():%Y-%m-%d} .. {dates[outside].max():%Y-%m-%d} outside '
+                               f'{first:%Y-%m-%d} .. {last:%Y-%m-%d}', 'error'))
+
+    if previous is not None and not compare:
+        violations.append(('row_count', None, abs(n - previous.rows), f'{previous.rows} rows before, {n} after',
+                           'error'))
+    elif compare:
+        for col in df.columns:
+            if col not in checked and col in previous.columns:
+                changed = previous.changed_rows(col, df[col])
+                if changed != 0:
+                    where = 'in place ' if changed is None else ''
+                    violations.append(('unchanged', col, changed, f'changed {where}by {step}, which only owns {owned}',
+                                       'error'))
+
+    return pd.DataFrame(violations, columns=REPORT_COLUMNS).astype({'rows': 'Int64'})
+
+
+class Validator:
+    """Validate a frame after each cleaning step, failing fast.
+
+    Errors raise ValidationError; warnings are issued with warnings.warn. Every report is
+    kept in `reports`, keyed by step.
+
+    Arguments:
+        df (pandas.DataFrame): The frame as it enters the first step; it is checked right away.
+    """
+
+    def __init__(self, df):
+        self.reports = {}
+        self._snapshot = None
+        self.check(df, 'load')
+
+    def check(self, df, step):
+        """ Validate `df` after `step` (a key of STEP_COLUMNS) against the frame before it. """
+        report = validate(df, self._snapshot, step)
+        self.reports[step] = report
+        errors = report[report['severity'] == 'error']
+        if len(errors):
+            raise ValidationError(step, errors)
+        for violation in report.itertuples():
+            warnings.warn(f'{violation.column}: {violation.rows} rows with {violation.detail} (after {step})')
+        self._snapshot = Snapshot(df)
+        return report
@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+from benchmarks.generate import generate_complaints
+
+ROWS = 10_000
+
+
+@pytest.fixture(scope='session')
+def export(tmp_path_factory):
+    """ Path of a synthetic 10K-row export (see benchmarks.generate). """
+    path = tmp_path_factory.mktemp('export') / 'complaints.csv'
+    generate_complaints(str(path), ROWS, seed=0)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def raw_export(export):
+    """ The export's raw values, as strings, for writing edited copies of it. """
+    return pd.read_csv(export, dtype=str, keep_default_na=False)
@@ -0,0 +1,22 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from cfpb import ComplaintCube, ComplaintIndex, load_clean_complaints
+
+
+@pytest.fixture(scope='module')
+def complaints(export, tmp_path_factory):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return load_clean_complaints(export, str(tmp_path_factory.mktemp('cache')))
+
+
+@pytest.mark.parametrize('where', [{'product': 'Mortgage'}, {'product': 'No such product'},
+                                   {'product': 'Mortgage', 'issue': 'Issue 058'}])
+def test_breakdown_by_filter_column(complaints, where):
+    # The counted column is also a filter column
+    expected = ComplaintIndex(complaints).value_counts('product', **where)
+    pd.testing.assert_series_equal(ComplaintCube.from_frame(complaints).breakdown('product', **where), expected,
+                                   check_index_type=False, check_categorical=False)
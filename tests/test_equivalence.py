@@ -0,0 +1,64 @@
+""" The streaming, parallel and incremental paths must give exactly what the in-memory path gives. """
+
+import warnings
+
+import pandas as pd
+import pytest
+
+from cfpb import (ComplaintCube, clean_complaints, load_complaints, load_store, load_store_cube,
+                  out_of_core_summary, parallel_clean_complaints, refresh, summary_tables)
+
+
+@pytest.fixture(autouse=True)
+def _quiet():
+    # Junk ZIP codes and the like are reported with warnings, which aren't under test here
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+def _assert_same(left, right):
+    """ Same tables: same labels in the same order and the same numbers (the index may be categorical or not). """
+    if isinstance(left, dict):
+        assert list(left) == list(right)
+        for key in left:
+            _assert_same(left[key], right[key])
+    elif isinstance(left, pd.DataFrame):
+        pd.testing.assert_frame_equal(left, right, check_index_type=False, check_categorical=False)
+    else:
+        pd.testing.assert_series_equal(left, right, check_index_type=False, check_categorical=False)
+
+
+def _sorted_rows(df):
+    rows = df.sort_values('complaint_id', ignore_index=True)
+    return rows.astype({col: object for col in rows.columns if isinstance(rows[col].dtype, pd.CategoricalDtype)})
+
+
+def test_out_of_core_summary(export):
+    expected = summary_tables(ComplaintCube.from_frame(clean_complaints(load_complaints(export))))
+    _assert_same(out_of_core_summary(export, chunksize=1_000), expected)
+
+
+def test_parallel_clean_complaints(export):
+    expected = clean_complaints(load_complaints(export))
+    # Small partitions, so that the export is cut into many byte ranges
+    pd.testing.assert_frame_equal(parallel_clean_complaints(export, workers=2, partition_size=1 << 18), expected)
+
+
+def test_refresh_matches_rebuild(export, raw_export, tmp_path):
+    # Yesterday's export: fewer complaints, and some of them filed under another product
+    yesterday = raw_export.iloc[:8_000].copy()
+    yesterday.loc[yesterday.index[:50], 'Product'] = 'Mortgage'
+    yesterday_path = tmp_path / 'yesterday.csv'
+    yesterday.to_csv(yesterday_path, index=False)
+
+    incremental, rebuilt = str(tmp_path / 'incremental'), str(tmp_path / 'rebuilt')
+    refresh(str(yesterday_path), incremental, chunksize=3_000)
+    result = refresh(export, incremental, chunksize=3_000)
+    refresh(export, rebuilt)
+
+    assert result['new'] == 2_000
+    assert result['changed'] > 0
+    pd.testing.assert_frame_equal(_sorted_rows(load_store(incremental)), _sorted_rows(load_store(rebuilt)))
+    pd.testing.assert_series_equal(load_store_cube(incremental).counts.sort_index(),
+                                   load_store_cube(rebuilt).counts.sort_index())
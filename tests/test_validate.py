@@ -0,0 +1,59 @@
+import warnings
+
+import pytest
+
+from cfpb import ValidationError, Validator, clean_complaints, load_complaints
+from cfpb.clean import parse_dates
+from cfpb.labels import normalize_labels
+from cfpb.recategorize import recategorize_products
+from cfpb.schema import STRING_DTYPE
+
+
+@pytest.fixture
+def checked(export):
+    """ A loaded export and its Validator, checked through normalize_labels. """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        df = load_complaints(export)
+        validator = Validator(df)
+        for step in (parse_dates, normalize_labels):
+            step(df)
+            validator.check(df, step.__name__)
+    return df, validator
+
+
+def test_step_that_changes_columns_it_does_not_own(checked):
+    df, validator = checked
+    recategorize_products(df)
+    loans = df['product'] == 'Consumer loan'
+    rewritten = int(df.loc[loans, 'zip'].ne('00000').fillna(True).sum())
+    df.loc[loans, 'zip'] = '00000'
+    df.loc[loans, 'company'] = df['company'].iloc[0]
+    with pytest.raises(ValidationError) as error:
+        validator.check(df, 'recategorize_products')
+    report = error.value.report.set_index('column')
+    assert set(report.index) == {'zip', 'company'}
+    assert (report['check'] == 'unchanged').all()
+    if STRING_DTYPE != 'category':
+        # Arrow strings keep their old values, so zip's changed rows can be counted
+        assert report.loc['zip', 'rows'] == rewritten
+
+
+def test_steps_that_only_change_their_own_columns(checked):
+    df, validator = checked
+    recategorize_products(df)
+    assert not (validator.check(df, 'recategorize_products')['check'] == 'unchanged').any()
+
+
+def test_malformed_date_is_a_warning(raw_export, tmp_path):
+    edited = raw_export.copy()
+    edited.loc[5, 'Date received'] = '2019-01-05'
+    path = tmp_path / 'complaints.csv'
+    edited.to_csv(path, index=False)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        complaints = clean_complaints(load_complaints(str(path)))
+    assert complaints['date_received'].isna().sum() == 1
+    assert any('missing values reported by parse_dates' in str(warning.message) for warning in caught)
+    with pytest.raises(ValueError, match='2019-01-05'):
+        parse_dates(load_complaints(str(path)), strict=True)